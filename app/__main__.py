@@ -1,17 +1,48 @@
 import asyncio
+import json
+import logging
+import signal
+from multiprocessing import Process
+from typing import Callable
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
 from aiogram.fsm.storage.redis import RedisStorage
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import ClientTimeout, web
+from apscheduler.jobstores.memory import MemoryJobStore
 from apscheduler.jobstores.redis import RedisJobStore
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from redis.asyncio import Redis
 
 from .bot import commands
 from .bot.handlers import include_routers
 from .bot.middlewares import register_middlewares
+from .bot.middlewares.album import AlbumMiddleware
+from .bot.middlewares.concurrency import ConcurrencyMiddleware
+from .bot.middlewares.throttling import ThrottlingMiddleware
+from .bot.session import RetryMiddleware, register_request_middlewares
+from .bot.utils.create_forum_topic import ForumTopicPool
+from .bot.utils.error_reporter import ErrorReporter
+from .bot.utils.message_deleter import MessageDeleter
+from .bot.utils.newsletter import wait_newsletters
+from .bot.utils.redis import UserCache, RedisStorage as UserStorage
+from .bot.utils.update_stream import UpdateConsumer, UpdateRouter
 from .config import load_config, Config
-from .logger import setup_logger
+from .logger import setup_logger, stop_logger
+
+# The number of seconds between checks of the job store for the jobs added by other processes
+JOB_STORE_POLL_INTERVAL = 1
+# The number of seconds a long polling request waits for the updates
+LONG_POLLING_TIMEOUT = 10
+
+
+async def poll_job_store() -> None:
+    """
+    Does nothing. Scheduled at an interval, it makes the scheduler check the job store
+    for the jobs added by other bot processes.
+    """
 
 
 async def on_shutdown(
@@ -19,49 +50,149 @@ async def on_shutdown(
     dispatcher: Dispatcher,
     config: Config,
     bot: Bot,
+    primary: bool,
+    user_cache: UserCache | None,
+    forum_topic_pool: ForumTopicPool | None,
+    message_deleter: MessageDeleter,
+    error_reporter: ErrorReporter,
+    concurrency_middleware: ConcurrencyMiddleware,
+    throttling_middleware: ThrottlingMiddleware,
+    retry_middleware: RetryMiddleware | None,
+    album_middleware: AlbumMiddleware,
 ) -> None:
     """
-    Shutdown event handler. This runs when the bot shuts down.
+    Shutdown event handler. This runs when the bot shuts down, after it stopped receiving updates.
 
     :param apscheduler: AsyncIOScheduler: The apscheduler instance.
     :param dispatcher: Dispatcher: The bot dispatcher.
     :param config: Config: The config instance.
     :param bot: Bot: The bot instance.
+    :param primary: bool: Whether this is the primary bot process.
+    :param user_cache: UserCache | None: The user data cache, if enabled.
+    :param forum_topic_pool: ForumTopicPool | None: The pool of ready forum topics, if enabled.
+    :param message_deleter: MessageDeleter: The delayed message deletion service.
+    :param error_reporter: ErrorReporter: The error reporting service.
+    :param concurrency_middleware: ConcurrencyMiddleware: The middleware tracking the pending updates.
+    :param throttling_middleware: ThrottlingMiddleware: The middleware collecting throttled messages.
+    :param retry_middleware: RetryMiddleware | None: The request retry middleware, if enabled.
+    :param album_middleware: AlbumMiddleware: The middleware collecting albums.
     """
+    # Stop starting scheduled jobs, the running ones continue while the updates are drained
+    if apscheduler.running:
+        apscheduler.pause()
+    # Wait for the updates being processed, then for the newsletters being sent, up to the same deadline,
+    # the newsletters not sent by then are cancelled and their progress is logged
+    deadline = asyncio.get_running_loop().time() + config.shutdown.TIMEOUT
+    drained = await concurrency_middleware.drain(config.shutdown.TIMEOUT)
+    newsletters = await wait_newsletters(deadline - asyncio.get_running_loop().time())
+    # Forward the collected throttled messages now
+    flushed = await throttling_middleware.flush()
+    logging.info(
+        f"Shutdown: {drained['completed']} updates completed, {drained['abandoned']} abandoned, "
+        f"{newsletters['completed']} newsletters completed, {newsletters['abandoned']} abandoned, "
+        f"throttled messages of {flushed} users forwarded"
+    )
+    # Log the update processing stats
+    logging.info(f"Concurrency stats: {concurrency_middleware.stats}")
+    logging.info(f"Throttling stats: {throttling_middleware.stats}")
+    logging.info(f"Album stats: {album_middleware.stats}")
+
     # Stop apscheduler
     apscheduler.shutdown()
-    # Delete commands and close storage when shutting down
-    await commands.delete(bot, config)
+    # Stop refilling the forum topic pool
+    if forum_topic_pool is not None:
+        await forum_topic_pool.stop()
+    # Stop deleting messages, the pending ones kept in memory are deleted now,
+    # the ones kept in Redis are deleted after a restart
+    await message_deleter.stop()
+    # Stop listening to cache invalidations
+    if user_cache is not None:
+        await user_cache.stop()
+    # Stop sending error digests, the repeated errors not reported yet are sent now
+    await error_reporter.stop()
+    # Delete commands when the primary process shuts down, if configured,
+    # the webhook is kept, so the updates received in the meantime are delivered after a restart
+    if primary and config.commands.DELETE_ON_SHUTDOWN:
+        await commands.delete(bot, config, dispatcher.storage.redis)
+    # Log the request retries
+    if retry_middleware is not None:
+        logging.info(f"Retry stats: {retry_middleware.stats}")
+    # Close storage and session
     await dispatcher.storage.close()
-    await bot.delete_webhook()
     await bot.session.close()
 
 
 async def on_startup(
     apscheduler: AsyncIOScheduler,
+    dispatcher: Dispatcher,
     config: Config,
     bot: Bot,
+    primary: bool,
+    user_cache: UserCache | None,
+    forum_topic_pool: ForumTopicPool | None,
+    message_deleter: MessageDeleter,
+    error_reporter: ErrorReporter,
 ) -> None:
     """
     Startup event handler. This runs when the bot starts up.
 
     :param apscheduler: AsyncIOScheduler: The apscheduler instance.
+    :param dispatcher: Dispatcher: The bot dispatcher.
     :param config: Config: The config instance.
     :param bot: Bot: The bot instance.
+    :param primary: bool: Whether this is the primary bot process.
+    :param user_cache: UserCache | None: The user data cache, if enabled.
+    :param forum_topic_pool: ForumTopicPool | None: The pool of ready forum topics, if enabled.
+    :param message_deleter: MessageDeleter: The delayed message deletion service.
+    :param error_reporter: ErrorReporter: The error reporting service.
     """
-    # Start apscheduler
-    apscheduler.start()
-    # Setup commands when starting up
-    await commands.setup(bot, config)
+    # Provide the bot and the storage to the newsletter tasks, which take them from the event loop,
+    # so the stored tasks can run before any update is received
+    loop = asyncio.get_running_loop()
+    loop.__setattr__("bot", bot)
+    loop.__setattr__("redis_storage", UserStorage(dispatcher.storage.redis, user_cache))
 
+    # Start apscheduler, the jobs are run by the primary process only,
+    # the other processes just add them to the job store
+    if primary:
+        if config.webhook.WORKERS > 1 or config.sharding.WORKERS > 1:
+            apscheduler.add_job(
+                poll_job_store, "interval", seconds=JOB_STORE_POLL_INTERVAL, jobstore="local",
+            )
+        apscheduler.start()
+    else:
+        apscheduler.start(paused=True)
+    # Start deleting messages
+    await message_deleter.start()
+    # Start sending error digests
+    await error_reporter.start()
+    # Start listening to cache invalidations
+    if user_cache is not None:
+        await user_cache.start()
+    if primary:
+        # Setup the changed commands when starting up
+        await commands.setup(bot, config, dispatcher.storage.redis)
+        # Set the webhook
+        if config.webhook.URL:
+            await bot.set_webhook(
+                url=config.webhook.url(),
+                secret_token=config.webhook.SECRET or None,
+                allowed_updates=dispatcher.resolve_used_update_types(),
+            )
+        # Start refilling the forum topic pool
+        if forum_topic_pool is not None:
+            await forum_topic_pool.start()
 
-async def main() -> None:
-    """
-    Main function that initializes the bot and starts the event loop.
+
+def create_dispatcher(config: Config, primary: bool = True) -> tuple[Bot, Dispatcher]:
     """
-    # Load config
-    config = load_config()
+    Creates the bot and the dispatcher with all services, routers and middlewares.
 
+    :param config: The config instance.
+    :param primary: Whether this is the primary bot process, which sets the webhook and the commands
+        and runs the scheduled jobs.
+    :return: The bot and the dispatcher.
+    """
     # Initialize apscheduler
     job_store = RedisJobStore(
         host=config.redis.HOST,
@@ -69,7 +200,7 @@ async def main() -> None:
         db=config.redis.DB,
     )
     apscheduler = AsyncIOScheduler(
-        jobstores={"default": job_store},
+        jobstores={"default": job_store, "local": MemoryJobStore()},
     )
 
     # Initialize Redis storage
@@ -77,6 +208,13 @@ async def main() -> None:
         url=config.redis.dsn(),
     )
 
+    # Initialize the user data cache
+    user_cache = UserCache(
+        redis=storage.redis,
+        maxsize=config.cache.MAXSIZE,
+        ttl=config.cache.TTL,
+    ) if config.cache.ENABLED else None
+
     # Create Bot and Dispatcher instances
     bot = Bot(
         token=config.bot.TOKEN,
@@ -84,8 +222,39 @@ async def main() -> None:
             parse_mode=ParseMode.HTML,
         ),
     )
+    # Register request middlewares, the retry middleware is provided to the shutdown handler to log its stats
+    retry_middleware = register_request_middlewares(bot, config=config)
+
+    # Initialize the pool of ready forum topics
+    forum_topic_pool = ForumTopicPool(
+        redis=storage.redis,
+        bot=bot,
+        config=config,
+        size=config.topic_pool.SIZE,
+    ) if config.topic_pool.SIZE > 0 else None
+
+    # Initialize the delayed message deletion
+    message_deleter = MessageDeleter(
+        bot=bot,
+        redis=storage.redis if config.deletion.PERSISTENT else None,
+    )
+
+    # Initialize the error reporting
+    error_reporter = ErrorReporter(
+        bot=bot,
+        chat_id=config.bot.DEV_ID,
+        interval=config.errors.REPORT_INTERVAL,
+        digest_interval=config.errors.DIGEST_INTERVAL,
+    )
+
     dp = Dispatcher(
         apscheduler=apscheduler,
+        user_cache=user_cache,
+        forum_topic_pool=forum_topic_pool,
+        message_deleter=message_deleter,
+        error_reporter=error_reporter,
+        retry_middleware=retry_middleware,
+        primary=primary,
         storage=storage,
         config=config,
         bot=bot,
@@ -100,16 +269,259 @@ async def main() -> None:
     include_routers(dp)
     # Register middlewares
     register_middlewares(
-        dp, config=config, redis=storage.redis, apscheduler=apscheduler
+        dp, config=config, redis=storage.redis, apscheduler=apscheduler, user_cache=user_cache
     )
+    return bot, dp
+
+
+async def main() -> None:
+    """
+    Main function that initializes the bot and starts long polling.
+    """
+    # Load config
+    config = load_config()
+    bot, dp = create_dispatcher(config)
 
     # Start the bot
     await bot.delete_webhook()
     await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
 
 
+async def create_app(worker: int) -> web.Application:
+    """
+    Creates the webhook server application of a bot process.
+
+    Telegram receives the response as soon as the update is accepted,
+    the update is processed in the background.
+
+    :param worker: The number of the bot process, the first one is the primary process.
+    :return: The aiohttp application.
+    """
+    config = load_config()
+    bot, dp = create_dispatcher(config, primary=worker == 0)
+
+    app = web.Application()
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        handle_in_background=True,
+        secret_token=config.webhook.SECRET or None,
+    ).register(app, path=config.webhook.PATH)
+    # Run the startup and shutdown handlers with the server
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+def run_webhook_worker(worker: int) -> None:
+    """
+    Runs the webhook server of a bot process until it receives SIGINT or SIGTERM.
+
+    With several processes, the kernel distributes the connections without regard to the conversation,
+    so the updates of a conversation are not kept in order; SHARDING_WORKERS keeps them in order.
+
+    :param worker: The number of the bot process.
+    """
+    config = load_config()
+    web.run_app(
+        create_app(worker),
+        host=config.webhook.HOST,
+        port=config.webhook.PORT,
+        # Let several processes listen on the same port, the order of the updates is not kept
+        reuse_port=config.webhook.WORKERS > 1,
+        print=None,
+    )
+
+
+def run_process(target: Callable[[int], None], worker: int) -> None:
+    """
+    Runs a bot process with its own log file.
+
+    :param target: The function run by the bot process with its number.
+    :param worker: The number of the bot process.
+    """
+    # The listener thread writing the logs is not inherited by the forked process
+    setup_logger(load_config().logging, f"worker-{worker}")
+    try:
+        target(worker)
+    finally:
+        stop_logger()
+
+
+def run_processes(target: Callable[[int], None], count: int) -> None:
+    """
+    Runs the bot processes and waits for them to exit.
+
+    :param target: The function run by a bot process with its number.
+    :param count: The number of bot processes.
+    """
+    processes = [
+        Process(target=run_process, args=(target, worker), name=f"worker-{worker}")
+        for worker in range(count)
+    ]
+    for process in processes:
+        process.start()
+
+    # Pass SIGTERM on to the bot processes, SIGINT is received by the whole process group
+    signal.signal(signal.SIGTERM, lambda *_: [process.terminate() for process in processes])
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    for process in processes:
+        process.join()
+
+
+def run_webhook(config: Config) -> None:
+    """
+    Runs the webhook servers of the configured number of bot processes.
+
+    :param config: The config instance.
+    """
+    if config.webhook.WORKERS <= 1:
+        run_webhook_worker(0)
+    else:
+        run_processes(run_webhook_worker, config.webhook.WORKERS)
+
+
+async def consume_updates(worker: int) -> None:
+    """
+    Processes the updates routed to a bot process until it receives SIGINT or SIGTERM.
+
+    :param worker: The number of the bot process, the first one is the primary process.
+    """
+    config = load_config()
+    bot, dp = create_dispatcher(config, primary=worker == 0)
+    # The consumer has its own connection, closed after the dispatcher's storage
+    redis = Redis.from_url(config.redis.dsn())
+    consumer = UpdateConsumer(redis, dp, bot, worker)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await dp.emit_startup(dispatcher=dp, **dp.workflow_data)
+    try:
+        await consumer.run(stop)
+    finally:
+        await dp.emit_shutdown(dispatcher=dp, **dp.workflow_data)
+        await consumer.close()
+        await redis.aclose()
+
+
+def run_consumer(worker: int) -> None:
+    """
+    Runs a bot process processing the routed updates.
+
+    :param worker: The number of the bot process.
+    """
+    asyncio.run(consume_updates(worker))
+
+
+async def poll_updates(bot: Bot, router: UpdateRouter, allowed_updates: list[str]) -> None:
+    """
+    Receives the updates with long polling and routes them to the bot processes.
+    An update is confirmed to Telegram only after it has been routed.
+    The updates are not parsed, like with a webhook, they are parsed by the bot processes.
+
+    :param bot: The Bot instance.
+    :param router: The UpdateRouter instance.
+    :param allowed_updates: The types of the updates to receive.
+    """
+    url = bot.session.api.api_url(token=bot.token, method="getUpdates")
+    timeout = ClientTimeout(total=LONG_POLLING_TIMEOUT + 10)
+
+    offset: int | None = None
+    while True:
+        try:
+            session = await bot.session.create_session()
+            params = {"timeout": LONG_POLLING_TIMEOUT, "allowed_updates": allowed_updates}
+            if offset is not None:
+                params["offset"] = offset
+            async with session.post(url, json=params, timeout=timeout) as response:
+                result = await response.json(loads=json.loads, content_type=None)
+            if not result.get("ok"):
+                raise RuntimeError(result.get("description"))
+
+            updates = result["result"]
+            if updates:
+                await router.route(updates)
+                offset = updates[-1]["update_id"] + 1
+        except Exception as e:
+            logging.exception(f"Failed to route updates: {e}")
+            await asyncio.sleep(1)
+
+
+async def route_updates(config: Config, allowed_updates: list[str]) -> None:
+    """
+    Receives the updates with a webhook or long polling and routes them to the bot processes
+    until it receives SIGINT or SIGTERM. The updates are not parsed with a webhook.
+
+    :param config: The config instance.
+    :param allowed_updates: The types of the updates to receive with long polling.
+    """
+    redis = Redis.from_url(config.redis.dsn())
+    router = UpdateRouter(redis, config.sharding.WORKERS)
+    bot = Bot(token=config.bot.TOKEN)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    try:
+        if config.webhook.URL:
+            # The webhook is set by the primary bot process
+            async def handle_update(request: web.Request) -> web.Response:
+                secret = request.headers.get("X-Telegram-Bot-Api-Secret-Token")
+                if config.webhook.SECRET and secret != config.webhook.SECRET:
+                    return web.Response(status=401)
+                await router.route([await request.json()])
+                return web.Response()
+
+            app = web.Application()
+            app.router.add_post(config.webhook.PATH, handle_update)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            await web.TCPSite(runner, config.webhook.HOST, config.webhook.PORT).start()
+            try:
+                await stop.wait()
+            finally:
+                await runner.cleanup()
+        else:
+            await bot.delete_webhook()
+            task = asyncio.create_task(poll_updates(bot, router, allowed_updates))
+            await stop.wait()
+            task.cancel()
+    finally:
+        await bot.session.close()
+        await redis.aclose()
+
+
+def run_sharded(config: Config) -> None:
+    """
+    Runs the bot processes and routes the updates to them by conversation,
+    so a conversation is always processed by the same process.
+
+    :param config: The config instance.
+    """
+    consumers = Process(target=run_processes, args=(run_consumer, config.sharding.WORKERS))
+    consumers.start()
+
+    # The used update types are resolved after the bot processes have included the routers
+    dp = Dispatcher()
+    include_routers(dp)
+    asyncio.run(route_updates(config, dp.resolve_used_update_types()))
+
+    consumers.terminate()
+    consumers.join()
+
+
 if __name__ == "__main__":
+    config = load_config()
     # Set up logging
-    setup_logger()
-    # Run the bot
-    asyncio.run(main())
+    setup_logger(config.logging)
+    # Run the bot with a webhook or long polling
+    if config.sharding.WORKERS > 1:
+        run_sharded(config)
+    elif config.webhook.URL:
+        run_webhook(config)
+    else:
+        asyncio.run(main())
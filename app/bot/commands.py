@@ -1,22 +1,31 @@
+import asyncio
+import hashlib
+import json
+
 from aiogram import Bot
 from aiogram.exceptions import TelegramBadRequest
 from aiogram.types import (
     BotCommand,
+    BotCommandScope,
     BotCommandScopeChat,
     BotCommandScopeAllGroupChats,
     BotCommandScopeAllPrivateChats,
 )
+from redis.asyncio import Redis
 
 from app.bot.utils.texts import SUPPORTED_LANGUAGES
 from app.config import Config
 
+# The name of the Redis hash storing the fingerprints of the command sets
+NAME = "bot_commands"
+
 
-async def setup(bot: Bot, config: Config) -> None:
+def get_command_sets(config: Config) -> list[tuple[BotCommandScope, str | None, list[BotCommand]]]:
     """
-    Set up bot commands for various scopes and languages.
+    Define bot commands for various scopes and languages.
 
-    :param bot: The Bot object.
     :param config: The Config object.
+    :return: List of the scope, the language code (None for any language) and the commands.
     """
     # Define bot commands for different languages
     commands = {
@@ -61,81 +70,129 @@ async def setup(bot: Bot, config: Config) -> None:
             [BotCommand(command="newsletter", description="Меню рассылки")],
     }
 
-    try:
-        # Set commands for dev or admin in English language
-        await bot.set_my_commands(
-            commands=admin_commands["en"],
-            scope=BotCommandScopeChat(chat_id=config.bot.DEV_ID),
-        )
-        # Set commands for dev or admin in Russian language
-        await bot.set_my_commands(
-            commands=admin_commands["ru"],
-            scope=BotCommandScopeChat(chat_id=config.bot.DEV_ID),
-            language_code="ru",
-        )
-    except TelegramBadRequest:
-        raise ValueError(f"Chat with DEV_ID {config.bot.DEV_ID} not found.")
+    return [
+        # Commands for dev or admin in English and Russian languages
+        (BotCommandScopeChat(chat_id=config.bot.DEV_ID), None, admin_commands["en"]),
+        (BotCommandScopeChat(chat_id=config.bot.DEV_ID), "ru", admin_commands["ru"]),
+        # Commands for all private chats in English and Russian languages
+        (BotCommandScopeAllPrivateChats(), None, commands["en"]),
+        (BotCommandScopeAllPrivateChats(), "ru", commands["ru"]),
+        # Commands for all group chats in English and Russian languages
+        (BotCommandScopeAllGroupChats(), None, group_commands["en"]),
+        (BotCommandScopeAllGroupChats(), "ru", group_commands["ru"]),
+    ]
 
-    # Set commands for all private chats in English language
-    await bot.set_my_commands(
-        commands=commands["en"],
-        scope=BotCommandScopeAllPrivateChats(),
-    )
-    # Set commands for all private chats in Russian language
-    await bot.set_my_commands(
-        commands=commands["ru"],
-        scope=BotCommandScopeAllPrivateChats(),
-        language_code="ru",
-    )
-    # Set commands for all group chats in English language
-    await bot.set_my_commands(
-        commands=group_commands["en"],
-        scope=BotCommandScopeAllGroupChats(),
-    )
-    # Set commands for all group chats in Russian language
-    await bot.set_my_commands(
-        commands=group_commands["ru"],
-        scope=BotCommandScopeAllGroupChats(),
-        language_code="ru"
+
+def get_fingerprint(scope: BotCommandScope, language_code: str | None, commands: list[BotCommand]) -> str:
+    """
+    Computes the fingerprint of a command set.
+
+    :param scope: The scope of the commands.
+    :param language_code: The language code of the commands, None for any language.
+    :param commands: The commands.
+    :return: The fingerprint.
+    """
+    data = json.dumps(
+        [scope.model_dump(), language_code, [command.model_dump() for command in commands]],
+        sort_keys=True,
     )
+    return hashlib.sha256(data.encode()).hexdigest()
 
 
-async def delete(bot: Bot, config: Config) -> None:
+def get_field(scope: BotCommandScope, language_code: str | None) -> str:
     """
-    Delete bot commands for various scopes and languages.
+    Returns the name of the field storing the fingerprint of a scope and language.
+
+    :param scope: The scope of the commands.
+    :param language_code: The language code of the commands, None for any language.
+    :return: The field name.
+    """
+    return f"{scope.type}:{getattr(scope, 'chat_id', '')}:{language_code or ''}"
+
+
+def raise_errors(config: Config, scopes: list[BotCommandScope], results: list) -> None:
+    """
+    Raises the first error of the requests sent in parallel for the scopes.
+    A bad request for the chat of DEV_ID is raised as a ValueError, the other errors are re-raised.
 
     :param config: The Config object.
+    :param scopes: The scopes of the requests.
+    :param results: The results of the requests, gathered with the exceptions.
+    """
+    for scope, result in zip(scopes, results):
+        if not isinstance(result, BaseException):
+            continue
+        if (
+                isinstance(result, TelegramBadRequest)
+                and isinstance(scope, BotCommandScopeChat)
+                and scope.chat_id == config.bot.DEV_ID
+        ):
+            raise ValueError(f"Chat with DEV_ID {config.bot.DEV_ID} not found.") from result
+        raise result
+
+
+async def setup(bot: Bot, config: Config, redis: Redis | None = None) -> None:
+    """
+    Set up bot commands for various scopes and languages.
+
+    Only the command sets changed since the last setup are sent, in parallel.
+    The fingerprints of the sent command sets are stored in Redis if given,
+    otherwise the current commands are fetched from Telegram.
+
     :param bot: The Bot object.
+    :param config: The Config object.
+    :param redis: The Redis instance storing the fingerprints, or None.
     """
+    command_sets = get_command_sets(config)
+    fields = [get_field(scope, language_code) for scope, language_code, _ in command_sets]
+    fingerprints = [get_fingerprint(*command_set) for command_set in command_sets]
+    key = f"{NAME}:{bot.id}"
 
-    try:
-        # Delete commands for dev or admin in any language
-        await bot.delete_my_commands(
-            scope=BotCommandScopeChat(chat_id=config.bot.DEV_ID),
-        )
-        # Delete commands for dev or admin in Russian language
-        await bot.delete_my_commands(
-            scope=BotCommandScopeChat(chat_id=config.bot.DEV_ID),
-            language_code="ru",
+    if redis is not None:
+        # Compare the command sets with the fingerprints of the last setup
+        stored = await redis.hmget(key, fields)
+        changed = [i for i, fingerprint in enumerate(fingerprints) if stored[i] != fingerprint.encode()]
+    else:
+        # Compare the command sets with the current commands
+        current = await asyncio.gather(*(
+            bot.get_my_commands(scope=scope, language_code=language_code)
+            for scope, language_code, _ in command_sets
+        ))
+        changed = [i for i, commands in enumerate(current) if commands != command_sets[i][2]]
+
+    # Set the changed commands in parallel
+    results = await asyncio.gather(*(
+        bot.set_my_commands(
+            commands=command_sets[i][2],
+            scope=command_sets[i][0],
+            language_code=command_sets[i][1],
         )
-    except TelegramBadRequest:
-        raise ValueError(f"Chat with DEV_ID {config.bot.DEV_ID} not found.")
+        for i in changed
+    ), return_exceptions=True)
 
-    # Delete commands for all private chats in any language
-    await bot.delete_my_commands(
-        scope=BotCommandScopeAllPrivateChats(),
-    )
-    # Delete commands for all private chats in Russian language
-    await bot.delete_my_commands(
-        scope=BotCommandScopeAllPrivateChats(),
-        language_code="ru",
-    )
-    # Delete commands for all group chats in any language
-    await bot.delete_my_commands(
-        scope=BotCommandScopeAllGroupChats(),
-    )
-    # Delete commands for all group chats in Russian language
-    await bot.delete_my_commands(
-        scope=BotCommandScopeAllGroupChats(),
-        language_code="ru",
-    )
+    # Remember the command sets that have been set, even if others failed
+    succeeded = [i for i, result in zip(changed, results) if not isinstance(result, BaseException)]
+    if redis is not None and succeeded:
+        await redis.hset(key, mapping={fields[i]: fingerprints[i] for i in succeeded})
+    raise_errors(config, [command_sets[i][0] for i in changed], results)
+
+
+async def delete(bot: Bot, config: Config, redis: Redis | None = None) -> None:
+    """
+    Delete bot commands for various scopes and languages.
+
+    :param config: The Config object.
+    :param bot: The Bot object.
+    :param redis: The Redis instance storing the fingerprints, or None.
+    """
+    command_sets = get_command_sets(config)
+    # Delete commands for all scopes and languages in parallel
+    results = await asyncio.gather(*(
+        bot.delete_my_commands(scope=scope, language_code=language_code)
+        for scope, language_code, _ in command_sets
+    ), return_exceptions=True)
+
+    # Forget the fingerprints, so the next setup sends all commands
+    if redis is not None:
+        await redis.delete(f"{NAME}:{bot.id}")
+    raise_errors(config, [scope for scope, _, _ in command_sets], results)
@@ -1,9 +1,9 @@
 from aiogram import Dispatcher
-from aiogram_newsletter.handlers import AiogramNewsletterHandlers
 
 from . import errors
 from . import group
 from . import private
+from .newsletter import NewsletterHandlers
 
 
 def include_routers(dp: Dispatcher) -> None:
@@ -20,7 +20,7 @@ def include_routers(dp: Dispatcher) -> None:
             errors.router,
         ]
     )
-    AiogramNewsletterHandlers().register(dp)
+    NewsletterHandlers().register(dp)
 
 
 __all__ = [
@@ -48,7 +48,10 @@ async def handler(message: Message, manager: Manager, redis: RedisStorage) -> No
     user_data = await redis.get_by_message_thread_id(message.message_thread_id)
     if not user_data: return None  # noqa
 
-    if user_data.message_silent_mode:
+    # Atomically toggle silent mode
+    message_silent_mode = await redis.toggle_field(user_data.id, "message_silent_mode")
+
+    if not message_silent_mode:
         text = manager.text_message.get("silent_mode_disabled")
         with suppress(TelegramBadRequest):
             # Reply with the specified text
@@ -60,8 +63,7 @@ async def handler(message: Message, manager: Manager, redis: RedisStorage) -> No
                 message_id=user_data.message_silent_id,
             )
 
-        user_data.message_silent_mode = False
-        user_data.message_silent_id = None
+        await redis.set_fields(user_data.id, message_silent_id=None)
     else:
         text = manager.text_message.get("silent_mode_enabled")
         with suppress(TelegramBadRequest):
@@ -71,10 +73,7 @@ async def handler(message: Message, manager: Manager, redis: RedisStorage) -> No
             # Pin the chat message with the silent mode status
             await msg.pin(disable_notification=True)
 
-        user_data.message_silent_mode = True
-        user_data.message_silent_id = msg.message_id
-
-    await redis.update_user(user_data.id, user_data)
+            await redis.set_fields(user_data.id, message_silent_id=msg.message_id)
 
 
 @router.message(Command("information"))
@@ -111,13 +110,11 @@ async def handler(message: Message, manager: Manager, redis: RedisStorage) -> No
     user_data = await redis.get_by_message_thread_id(message.message_thread_id)
     if not user_data: return None  # noqa
 
-    if user_data.is_banned:
-        user_data.is_banned = False
-        text = manager.text_message.get("user_unblocked")
-    else:
-        user_data.is_banned = True
+    # Atomically toggle the ban status
+    if await redis.toggle_field(user_data.id, "is_banned"):
         text = manager.text_message.get("user_blocked")
+    else:
+        text = manager.text_message.get("user_unblocked")
 
     # Reply with the specified text
     await message.reply(text)
-    await redis.update_user(user_data.id, user_data)
@@ -9,6 +9,7 @@ from aiogram.utils.markdown import hlink
 
 from app.bot.manager import Manager
 from app.bot.types.album import Album
+from app.bot.utils.message_deleter import MessageDeleter
 from app.bot.utils.redis import RedisStorage
 
 router = Router()
@@ -54,7 +55,13 @@ async def handler(message: Message) -> None:
 
 @router.message(F.media_group_id, F.from_user[F.is_bot.is_(False)])
 @router.message(F.media_group_id.is_(None), F.from_user[F.is_bot.is_(False)])
-async def handler(message: Message, manager: Manager, redis: RedisStorage, album: Optional[Album] = None) -> None:
+async def handler(
+        message: Message,
+        manager: Manager,
+        redis: RedisStorage,
+        message_deleter: MessageDeleter,
+        album: Optional[Album] = None,
+) -> None:
     """
     Handles user messages and sends them to the respective user.
     If silent mode is enabled for the user, the messages are ignored.
@@ -62,6 +69,7 @@ async def handler(message: Message, manager: Manager, redis: RedisStorage, album
     :param message: Message object.
     :param manager: Manager object.
     :param redis: RedisStorage object.
+    :param message_deleter: MessageDeleter object.
     :param album: Album object or None.
     :return: None
     """
@@ -89,7 +97,5 @@ async def handler(message: Message, manager: Manager, redis: RedisStorage, album
 
     # Reply to the edited message with the specified text
     msg = await message.reply(text)
-    # Wait for 5 seconds before deleting the reply
-    await asyncio.sleep(5)
-    # Delete the reply to the edited message
-    await msg.delete()
+    # Delete the reply in 5 seconds
+    await message_deleter.delete_later(msg, 5)
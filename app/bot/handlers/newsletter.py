@@ -0,0 +1,71 @@
+import asyncio
+
+from aiogram.types import CallbackQuery
+from aiogram_newsletter.handlers import AiogramNewsletterHandlers
+from apscheduler.triggers.date import DateTrigger
+
+from app.bot.utils.newsletter import NewsletterManager, run_newsletter_task
+
+
+class NewsletterHandlers(AiogramNewsletterHandlers):
+    """
+    Newsletter handlers that send the newsletter to users streamed from Redis
+    instead of a list of IDs stored in the FSM context and the job store.
+    """
+
+    @classmethod
+    async def _confirmation_now_callback_handler(
+            cls,
+            call: CallbackQuery,
+            an_manager: NewsletterManager,
+    ) -> None:
+        """
+        Starts the newsletter at once in a background task on confirmation.
+
+        :param call: The callback query.
+        :param an_manager: The newsletter manager.
+        :return: None
+        """
+        if call.data == "back":
+            await an_manager.open_choose_options_window()
+        elif call.data == "confirm":
+            user_data = an_manager.user.model_dump()
+            message_data = await an_manager.data_storage.get_data("message_data")
+
+            _ = asyncio.create_task(run_newsletter_task(user_data, message_data))
+            await an_manager.open_newsletters_window()
+
+        await call.answer()
+
+    @classmethod
+    async def _confirmation_later_callback_handler(
+            cls,
+            call: CallbackQuery,
+            an_manager: NewsletterManager,
+    ) -> None:
+        """
+        Schedules the newsletter for the selected time on confirmation.
+
+        :param call: The callback query.
+        :param an_manager: The newsletter manager.
+        :return: None
+        """
+        if call.data == "back":
+            await an_manager.open_send_datetime_window()
+        elif call.data == "confirm":
+            user_data = an_manager.user.model_dump()
+            message_data = await an_manager.data_storage.get_data("message_data")
+            datetime_obj = await an_manager.data_storage.get_data("datetime_obj")
+
+            an_manager.apscheduler.add_job(
+                func=run_newsletter_task,
+                trigger=DateTrigger(datetime_obj),
+                kwargs={
+                    "user_data": user_data,
+                    "message_data": message_data,
+                },
+            )
+
+            await an_manager.open_newsletters_window()
+
+        await call.answer()
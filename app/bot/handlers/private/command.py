@@ -1,11 +1,11 @@
 from aiogram import Router, F
 from aiogram.filters import Command, MagicData
 from aiogram.types import Message
-from aiogram_newsletter.manager import ANManager
 
 from app.bot.handlers.private.windows import Window
 from app.bot.manager import Manager
-from app.bot.utils.create_forum_topic import get_or_create_forum_topic
+from app.bot.utils.create_forum_topic import ForumTopicPool, get_or_create_forum_topic
+from app.bot.utils.newsletter import NewsletterManager
 from app.bot.utils.redis import RedisStorage
 from app.bot.utils.redis.models import UserData
 
@@ -19,6 +19,7 @@ async def handler(
         manager: Manager,
         redis: RedisStorage,
         user_data: UserData,
+        forum_topic_pool: ForumTopicPool | None,
 ) -> None:
     """
     Handles the /start command.
@@ -30,6 +31,7 @@ async def handler(
     :param manager: Manager object.
     :param redis: RedisStorage object.
     :param user_data: UserData object.
+    :param forum_topic_pool: ForumTopicPool object or None.
     :return: None
     """
     if user_data.language_code:
@@ -39,7 +41,7 @@ async def handler(
     await manager.delete_message(message)
 
     # Create the forum topic
-    await get_or_create_forum_topic(message.bot, redis, manager.config, user_data)
+    await get_or_create_forum_topic(message.bot, redis, manager.config, user_data, forum_topic_pool)
 
 
 @router.message(Command("language"))
@@ -83,7 +85,7 @@ async def handler(message: Message, manager: Manager) -> None:
 async def handler(
         message: Message,
         manager: Manager,
-        an_manager: ANManager,
+        an_manager: NewsletterManager,
         redis: RedisStorage,
 ) -> None:
     """
@@ -92,9 +94,9 @@ async def handler(
     :param message: Message object.
     :param manager: Manager object.
     :param redis: RedisStorage object.
-    :param an_manager: Manager object from aiogram_newsletter.
+    :param an_manager: NewsletterManager object.
     :return: None
     """
-    users_ids = await redis.get_all_users_ids()
-    await an_manager.newsletter_menu(users_ids, Window.main_menu)
+    users_total = await redis.count_users()
+    await an_manager.newsletter_menu(users_total, Window.main_menu)
     await manager.delete_message(message)
@@ -1,5 +1,3 @@
-import asyncio
-
 from aiogram import Router, F
 from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import StateFilter
@@ -8,9 +6,11 @@ from aiogram.types import Message
 from app.bot.manager import Manager
 from app.bot.types.album import Album
 from app.bot.utils.create_forum_topic import (
-    create_forum_topic,
+    ForumTopicPool,
     get_or_create_forum_topic,
+    recreate_forum_topic,
 )
+from app.bot.utils.message_deleter import MessageDeleter
 from app.bot.utils.redis import RedisStorage
 from app.bot.utils.redis.models import UserData
 
@@ -19,31 +19,32 @@ router.message.filter(F.chat.type == "private", StateFilter(None))
 
 
 @router.edited_message()
-async def handle_edited_message(message: Message, manager: Manager) -> None:
+async def handle_edited_message(message: Message, manager: Manager, message_deleter: MessageDeleter) -> None:
     """
     Handle edited messages.
 
     :param message: The edited message.
     :param manager: Manager object.
+    :param message_deleter: MessageDeleter object.
     :return: None
     """
     # Get the text for the edited message
     text = manager.text_message.get("message_edited")
     # Reply to the edited message with the specified text
     msg = await message.reply(text)
-    # Wait for 5 seconds before deleting the reply
-    await asyncio.sleep(5)
-    # Delete the reply to the edited message
-    await msg.delete()
+    # Delete the reply in 5 seconds
+    await message_deleter.delete_later(msg, 5)
 
 
-@router.message(F.media_group_id)
-@router.message(F.media_group_id.is_(None))
+@router.message(F.media_group_id, flags={"throttling_coalesce": True})
+@router.message(F.media_group_id.is_(None), flags={"throttling_coalesce": True})
 async def handle_incoming_message(
         message: Message,
         manager: Manager,
         redis: RedisStorage,
         user_data: UserData,
+        forum_topic_pool: ForumTopicPool | None,
+        message_deleter: MessageDeleter,
         album: Album | None = None,
 ) -> None:
     """
@@ -54,6 +55,8 @@ async def handle_incoming_message(
     :param manager: Manager object.
     :param redis: RedisStorage object.
     :param user_data: UserData object.
+    :param forum_topic_pool: ForumTopicPool object or None.
+    :param message_deleter: MessageDeleter object.
     :param album: Album object or None.
     :return: None
     """
@@ -71,6 +74,7 @@ async def handle_incoming_message(
             redis,
             manager.config,
             user_data,
+            forum_topic_pool,
         )
 
         if not album:
@@ -88,12 +92,13 @@ async def handle_incoming_message(
         await copy_message_to_topic()
     except TelegramBadRequest as ex:
         if "message thread not found" in ex.message:
-            user_data.message_thread_id = await create_forum_topic(
+            await recreate_forum_topic(
                 message.bot,
+                redis,
                 manager.config,
-                user_data.full_name,
+                user_data,
+                forum_topic_pool,
             )
-            await redis.update_user(user_data.id, user_data)
             await copy_message_to_topic()
         else:
             raise
@@ -102,7 +107,5 @@ async def handle_incoming_message(
     text = manager.text_message.get("message_sent")
     # Reply to the edited message with the specified text
     msg = await message.reply(text)
-    # Wait for 5 seconds before deleting the reply
-    await asyncio.sleep(5)
-    # Delete the reply to the edited message
-    await msg.delete()
+    # Delete the reply in 5 seconds
+    await message_deleter.delete_later(msg, 5)
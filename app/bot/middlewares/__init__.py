@@ -1,10 +1,14 @@
 from aiogram import Dispatcher
-from aiogram_newsletter.middleware import AiogramNewsletterMiddleware
+from aiogram.dispatcher.middlewares.error import ErrorsMiddleware
 
 from .album import AlbumMiddleware
+from .concurrency import ConcurrencyMiddleware
+from .log_context import LogContextMiddleware
 from .manager import ManagerMiddleware
+from .newsletter import NewsletterMiddleware
 from .redis import RedisMiddleware
 from .throttling import ThrottlingMiddleware
+from .user_data import UserDataMiddleware
 
 
 def register_middlewares(dp: Dispatcher, **kwargs) -> None:
@@ -18,18 +22,57 @@ def register_middlewares(dp: Dispatcher, **kwargs) -> None:
     Returns:
         None
     """
+    # Register ConcurrencyMiddleware right after the built-in ErrorsMiddleware, before the built-in
+    # middlewares reading the FSM state, so the updates of a conversation are queued in the order
+    # they arrive, it is also provided to the shutdown handler to wait for the pending updates and log its stats
+    concurrency_middleware = ConcurrencyMiddleware(kwargs["config"].concurrency.LIMIT)
+    builtin_middlewares = [
+        middleware for middleware in dp.update.outer_middleware
+        if not isinstance(middleware, ErrorsMiddleware)
+    ]
+    for middleware in builtin_middlewares:
+        dp.update.outer_middleware.unregister(middleware)
+    dp.update.outer_middleware.register(concurrency_middleware)
+    for middleware in builtin_middlewares:
+        dp.update.outer_middleware.register(middleware)
+    dp["concurrency_middleware"] = concurrency_middleware
+
+    # Register LogContextMiddleware for the updates and the events,
+    # so the log records have the update, the user, the topic and the handler
+    log_context_middleware = LogContextMiddleware()
+    dp.update.outer_middleware.register(log_context_middleware)
+
     # Register RedisMiddleware with the provided Redis instance
-    dp.update.outer_middleware.register(RedisMiddleware(kwargs["redis"]))
-    # Register ManagerMiddleware
-    dp.update.outer_middleware.register(ManagerMiddleware())
+    redis_middleware = RedisMiddleware(kwargs["redis"], kwargs.get("user_cache"))
+    dp.update.outer_middleware.register(redis_middleware)
 
-    # Register AlbumMiddleware for message processing
-    dp.message.middleware.register(AlbumMiddleware())
-    # Register ThrottlingMiddleware for message processing
-    dp.message.middleware.register(ThrottlingMiddleware())
+    # Register AlbumMiddleware for message processing, the albums are collected in Redis
+    # if the updates may be processed by several bot processes,
+    # it is also provided to the shutdown handler to log its stats
+    album_middleware = AlbumMiddleware(
+        kwargs["redis"] if kwargs["config"].album.SHARED else None,
+    )
+    dp.message.middleware.register(album_middleware)
+    dp["album_middleware"] = album_middleware
+    # Register ThrottlingMiddleware for message processing,
+    # it is also provided to the shutdown handler to forward the collected messages and log its stats
+    throttling_middleware = ThrottlingMiddleware(
+        kwargs["redis"], coalesce=kwargs["config"].throttling.COALESCE,
+    )
+    dp.message.middleware.register(throttling_middleware)
+    dp["throttling_middleware"] = throttling_middleware
 
-    # Register AiogramNewsletterMiddleware for newsletter processing
-    dp.update.middleware.register(AiogramNewsletterMiddleware(kwargs["apscheduler"]))
+    # Register UserDataMiddleware, ManagerMiddleware and NewsletterMiddleware as inner middlewares,
+    # so the user data, the manager and the newsletter manager are loaded only for the handlers that use them,
+    # the user data is read first, together with the state data
+    user_data_middleware = UserDataMiddleware()
+    manager_middleware = ManagerMiddleware()
+    newsletter_middleware = NewsletterMiddleware(kwargs["apscheduler"])
+    for observer in (dp.message, dp.edited_message, dp.callback_query, dp.my_chat_member):
+        observer.middleware.register(log_context_middleware)
+        observer.middleware.register(user_data_middleware)
+        observer.middleware.register(manager_middleware)
+        observer.middleware.register(newsletter_middleware)
 
 
 __all__ = [
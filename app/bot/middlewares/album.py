@@ -1,36 +1,125 @@
 from __future__ import annotations
 
-from asyncio import sleep
-from typing import Any, Awaitable, Callable, Dict, MutableMapping, Optional, Tuple, cast
+import asyncio
+import logging
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 
-from aiogram import BaseMiddleware
+from aiogram import BaseMiddleware, Bot
 from aiogram.types import Message, TelegramObject
-from cachetools import TTLCache
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
 
 from ..types.album import Album, Media
 
+# Adds a part of an album, the first part claims collecting the album.
+# KEYS[1] - list of the parts, KEYS[2] - collector key.
+# ARGV[1] - the part, ARGV[2] - time-to-live of the keys in milliseconds.
+# Returns whether the caller collects the album and the number of parts.
+ADD_PART_SCRIPT = """
+redis.call("RPUSH", KEYS[1], ARGV[1])
+redis.call("PEXPIRE", KEYS[1], ARGV[2])
+local collector = redis.call("SET", KEYS[2], "1", "NX", "PX", ARGV[2])
+return {collector and 1 or 0, redis.call("LLEN", KEYS[1])}
+"""
+
+# Takes all parts of an album if no new parts were added, or in any case if forced.
+# KEYS[1] - list of the parts, KEYS[2] - collector key.
+# ARGV[1] - the number of parts seen by the caller, ARGV[2] - 1 to force taking the parts.
+# Returns the parts, the current number of parts if new parts were added,
+# or nil if the album has already been taken.
+FLUSH_SCRIPT = """
+if redis.call("EXISTS", KEYS[2]) == 0 then
+    return nil
+end
+local count = redis.call("LLEN", KEYS[1])
+if ARGV[2] == "0" and count ~= tonumber(ARGV[1]) then
+    return count
+end
+local parts = redis.call("LRANGE", KEYS[1], 0, -1)
+redis.call("DEL", KEYS[1], KEYS[2])
+return parts
+"""
+
+
+@dataclass
+class _AlbumParts:
+    """
+    The parts of a media group received so far.
+    """
+    messages: List[Message] = field(default_factory=list)
+    # Set when a new part arrives
+    received: asyncio.Event = field(default_factory=asyncio.Event)
+    started: float = field(default_factory=time.monotonic)
+
 
 class AlbumMiddleware(BaseMiddleware):
     """
     Middleware for accepting media groups (Album message).
+
+    The first part of a media group waits until no new parts arrive for the quiet period,
+    so the waiting time is extended for each new part. The album is processed at once
+    when it has the maximum number of parts, and in any case after the maximum latency.
+
+    With Redis, the parts are collected in Redis, so an album is assembled once even if its parts
+    are received by different bot processes. The process that received the first part collects
+    the album, and the parts are taken atomically, so exactly one process handles the album.
+    While Redis is unavailable, the parts are collected in memory.
     """
 
+    PREFIX = "album"
+    # The time-to-live in seconds of the parts kept in Redis
+    TTL = 10
+
     def __init__(
             self,
+            redis: Redis | None = None,
             album_key: str = "album",
             latency: float = 0.2,
-            ttl: float = 0.3,
+            max_latency: float = 1,
+            max_size: int = 10,
     ) -> None:
         """
         Initialize the AlbumMiddleware.
 
+        :param redis: The Redis instance collecting the parts or None to collect them in memory.
         :param album_key: The key to store the album data in the data dictionary.
-        :param latency: The latency in seconds to wait before processing the album.
-        :param ttl: The time-to-live in seconds for the cache entries.
+        :param latency: The quiet period in seconds after the last part before processing the album.
+        :param max_latency: The maximum number of seconds to wait for the parts of an album.
+        :param max_size: The maximum number of parts of an album.
         """
         self.album_key = album_key
         self.latency = latency
-        self.cache: MutableMapping[str, Dict[str, Any]] = TTLCache(maxsize=10_000, ttl=ttl)
+        self.max_latency = max_latency
+        self.max_size = max_size
+        self.albums: Dict[str, _AlbumParts] = {}
+
+        self.redis = redis
+        if redis is not None:
+            self._add_part_script = redis.register_script(ADD_PART_SCRIPT)
+            self._flush_script = redis.register_script(FLUSH_SCRIPT)
+
+        # The number of albums by size, the number of albums with known assembly time and its total
+        self.sizes: Counter[int] = Counter()
+        self.timed = 0
+        self.assembly_time = 0.0
+
+    @property
+    def stats(self) -> dict[str, float]:
+        """
+        Returns the album assembly metrics.
+
+        :return: Dictionary with the number of albums, the number of albums by size
+            and the average assembly latency in seconds.
+        """
+        albums = sum(self.sizes.values())
+        return {
+            "albums": albums,
+            **{f"size_{size}": count for size, count in sorted(self.sizes.items())},
+            "latency": self.assembly_time / self.timed if self.timed else 0.0,
+        }
 
     @staticmethod
     def get_content(message: Message) -> Optional[Tuple[Media, str]]:
@@ -66,30 +155,157 @@ class AlbumMiddleware(BaseMiddleware):
         """
         # Check if the event is a message with a media group ID
         if isinstance(event, Message) and event.media_group_id is not None:
-            key = event.media_group_id
-            media, content_type = cast(Tuple[Media, str], self.get_content(event))
-
-            # If the media group ID is already in the cache
-            if key in self.cache:
-                if content_type not in self.cache[key]:
-                    self.cache[key][content_type] = [media]
-                    return None
-                self.cache[key]["messages"].append(event)
-                self.cache[key][content_type].append(media)
-                return None
+            if self.redis is not None:
+                try:
+                    messages = await self.assemble_in_redis(event, data["bot"])
+                except RedisError as e:
+                    logging.warning(f"Album collection falls back to memory: {e}")
+                    messages = await self.assemble_in_memory(event)
+            else:
+                messages = await self.assemble_in_memory(event)
 
-            # If the media group ID is not in the cache, add it with the media data
-            self.cache[key] = {
-                content_type: [media],
-                "messages": [event],
-                "caption": event.html_text,
-            }
-            await sleep(self.latency)
+            # The part has been added to an album handled by another call
+            if messages is None:
+                return None
 
+            self.sizes[len(messages)] += 1
             # Validate the album data using the Album model
             data[self.album_key] = Album.model_validate(
-                self.cache[key], context={"bot": data["bot"]}
+                self.build(messages), context={"bot": data["bot"]}
             )
 
         # Call the handler function with the event and data
         return await handler(event, data)
+
+    async def assemble_in_memory(self, event: Message) -> Optional[List[Message]]:
+        """
+        Collects the parts of an album received by this process.
+
+        :param event: The part of the album.
+        :return: The parts of the album if this is the first part, otherwise None.
+        """
+        key = event.media_group_id
+
+        # If the media group is being collected, add the part and wake up the first part
+        if key in self.albums:
+            parts = self.albums[key]
+            parts.messages.append(event)
+            parts.received.set()
+            return None
+
+        # Otherwise, this is the first part, collect the album
+        parts = self.albums[key] = _AlbumParts(messages=[event])
+        try:
+            await self.collect(parts)
+        finally:
+            del self.albums[key]
+
+        self.timed += 1
+        self.assembly_time += time.monotonic() - parts.started
+        return parts.messages
+
+    async def assemble_in_redis(self, event: Message, bot: Bot) -> Optional[List[Message]]:
+        """
+        Collects the parts of an album received by all bot processes.
+
+        :param event: The part of the album.
+        :param bot: The Bot instance.
+        :return: The parts of the album if this call takes them, otherwise None.
+        """
+        key = event.media_group_id
+        keys = [f"{self.PREFIX}:{key}", f"{self.PREFIX}:{key}:collector"]
+
+        is_collector, count = await self._add_part_script(
+            keys=keys, args=[event.model_dump_json(exclude_none=True), self.TTL * 1000],
+        )
+
+        if is_collector:
+            # Wake up on the parts received by this process, the others are checked in Redis
+            parts = self.albums[key] = _AlbumParts()
+            try:
+                raw_parts = await self.collect_in_redis(keys, parts, count)
+            finally:
+                del self.albums[key]
+            if raw_parts is not None:
+                self.timed += 1
+                self.assembly_time += time.monotonic() - parts.started
+
+        elif count >= self.max_size:
+            # The album is complete, take it without waiting for the collector
+            raw_parts = await self._flush_script(keys=keys, args=[count, 1])
+
+        else:
+            if key in self.albums:
+                self.albums[key].received.set()
+            return None
+
+        if raw_parts is None:
+            return None
+        return [Message.model_validate_json(raw, context={"bot": bot}) for raw in raw_parts]
+
+    async def collect_in_redis(self, keys: List[str], parts: _AlbumParts, count: int) -> Optional[List[bytes]]:
+        """
+        Waits for the parts of an album in Redis and takes them.
+
+        :param keys: The Redis keys of the album.
+        :param parts: The local state of the album, used for wake-ups.
+        :param count: The number of parts after adding the first part.
+        :return: The parts of the album, or None if they have been taken by another call.
+        """
+        deadline = parts.started + self.max_latency
+        while True:
+            remaining = deadline - time.monotonic()
+            force = remaining <= 0 or count >= self.max_size
+
+            if not force:
+                try:
+                    # A part received by this process resets the quiet period
+                    await asyncio.wait_for(parts.received.wait(), min(self.latency, remaining))
+                    parts.received.clear()
+                    continue
+                except asyncio.TimeoutError:
+                    pass
+
+            result = await self._flush_script(keys=keys, args=[count, int(force)])
+            if not isinstance(result, int):
+                return result
+            # New parts were received by other processes, wait for the quiet period again
+            count = result
+
+    async def collect(self, parts: _AlbumParts) -> None:
+        """
+        Waits for the parts of an album.
+
+        :param parts: The parts of the album.
+        """
+        deadline = parts.started + self.max_latency
+        while len(parts.messages) < self.max_size:
+            timeout = min(self.latency, deadline - time.monotonic())
+            if timeout <= 0:
+                break
+            try:
+                await asyncio.wait_for(parts.received.wait(), timeout)
+            except asyncio.TimeoutError:
+                break
+            parts.received.clear()
+
+    def build(self, messages: List[Message]) -> Dict[str, Any]:
+        """
+        Builds the album data from the parts in the order they were sent.
+
+        :param messages: The parts of the album.
+        :return: The album data for the Album model.
+        """
+        messages = sorted(messages, key=lambda m: m.message_id)
+        album: Dict[str, Any] = {"messages": messages, "caption": None}
+
+        for message in messages:
+            content = self.get_content(message)
+            if content is not None:
+                media, content_type = content
+                album.setdefault(content_type, []).append(media)
+            # Use the first caption, only one part of an album usually has it
+            if album["caption"] is None and message.caption:
+                album["caption"] = message.html_text
+
+        return album
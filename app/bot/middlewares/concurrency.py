@@ -0,0 +1,238 @@
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.middlewares.user_context import UserContextMiddleware
+from aiogram.types import TelegramObject, Update
+
+
+@dataclass
+class _AlbumTurn:
+    """
+    The turn of a conversation taken by an album, shared by the parts of the album.
+    """
+    media_group_id: str
+    # Set when the first part of the album has taken the turn
+    started: asyncio.Event = field(default_factory=asyncio.Event)
+    # The number of the other parts being processed, and an event set when there are none
+    parts: int = 0
+    done: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+class ConcurrencyMiddleware(BaseMiddleware):
+    """
+    Middleware limiting the number of updates processed at once,
+    and processing the updates of a conversation one at a time, in the order they arrive.
+
+    A conversation is a forum topic in the group, or a user in any other chat,
+    so the messages of a user are forwarded to the topic in order, and so are the replies
+    in a topic to the user. Different conversations are processed in parallel up to the limit,
+    the other updates wait in the queue.
+
+    The middleware must run before the built-in middlewares reading the FSM state:
+    an update takes its place in the queue of the conversation before anything is awaited,
+    so the updates are queued in the order they are fed to the dispatcher.
+
+    The parts of an album share the turn of the first part, which holds it
+    until all parts have been processed, so the album is handled before the next update.
+    """
+
+    def __init__(self, limit: int = 100) -> None:
+        """
+        Initializes the ConcurrencyMiddleware instance.
+
+        :param limit: The maximum number of updates processed at once, 0 for no limit.
+        """
+        self.limit = limit
+        self._semaphore = asyncio.Semaphore(limit) if limit > 0 else None
+
+        # Locks of the conversations with the number of updates holding or waiting for them
+        self._locks: Dict[Hashable, tuple[asyncio.Lock, int]] = {}
+        # The albums holding or waiting for the turn of their conversations
+        self._albums: Dict[Hashable, _AlbumTurn] = {}
+        # The numbers of updates received and not processed yet, and of the ones being processed
+        self.pending = 0
+        self.running = 0
+        # Set while no updates are pending
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """
+        Returns the number of updates waiting and being processed.
+
+        :return: Dictionary with the queue depth, the number of running updates
+            and the number of conversations with updates.
+        """
+        return {
+            "queued": self.pending - self.running,
+            "running": self.running,
+            "conversations": len(self._locks),
+        }
+
+    @staticmethod
+    def get_conversation(event: TelegramObject) -> Optional[Hashable]:
+        """
+        Returns the key of the conversation the update belongs to.
+
+        :param event: The Telegram event.
+        :return: The conversation key, or None if the update is not serialized.
+        """
+        if not isinstance(event, Update):
+            return None
+        # The event context is resolved by a built-in middleware running after this one
+        context = UserContextMiddleware.resolve_event_context(event)
+        if context.chat_id is None:
+            return None
+        if context.thread_id is not None:
+            return context.chat_id, context.thread_id
+        return context.chat_id, context.user_id
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any],
+    ) -> Any:
+        """
+        Call the middleware.
+
+        :param handler: The handler function.
+        :param event: The Telegram event.
+        :param data: Additional data.
+        :return: The result of the handler function.
+        """
+        conversation = self.get_conversation(event)
+        self.pending += 1
+        self._idle.clear()
+        try:
+            if conversation is None:
+                return await self.run(handler, event, data)
+
+            media_group_id = event.message.media_group_id if event.message else None
+            if media_group_id is not None:
+                album = self._albums.get(conversation)
+                if album is not None and album.media_group_id == media_group_id:
+                    return await self.run_album_part(album, handler, event, data)
+                album = self._albums[conversation] = _AlbumTurn(media_group_id)
+                try:
+                    return await self.run_in_order(conversation, handler, event, data, album)
+                finally:
+                    # Don't keep the other parts waiting if the first one has been cancelled
+                    album.started.set()
+                    if self._albums.get(conversation) is album:
+                        del self._albums[conversation]
+
+            return await self.run_in_order(conversation, handler, event, data)
+        finally:
+            self.pending -= 1
+            if self.pending == 0:
+                self._idle.set()
+
+    async def drain(self, timeout: float) -> dict[str, int]:
+        """
+        Waits for the pending updates to be processed, when no new updates are received.
+
+        :param timeout: The maximum number of seconds to wait.
+        :return: Dictionary with the numbers of updates completed while waiting and abandoned.
+        """
+        pending = self.pending
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return {"completed": pending - self.pending, "abandoned": self.pending}
+
+    async def run_in_order(
+            self,
+            conversation: Hashable,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any],
+            album: Optional[_AlbumTurn] = None,
+    ) -> Any:
+        """
+        Processes the update after the previous updates of the conversation.
+        The place in the queue is taken before anything is awaited.
+
+        :param conversation: The conversation key.
+        :param handler: The handler function.
+        :param event: The Telegram event.
+        :param data: Additional data.
+        :param album: The turn of the album, if the update is its first part.
+        :return: The result of the handler function.
+        """
+        lock, count = self._locks.get(conversation, (asyncio.Lock(), 0))
+        self._locks[conversation] = (lock, count + 1)
+        try:
+            async with lock:
+                if album is None:
+                    return await self.run(handler, event, data)
+
+                # Let the other parts of the album in, and hold the turn until they are processed
+                album.started.set()
+                try:
+                    return await self.run(handler, event, data)
+                finally:
+                    while album.parts:
+                        album.done.clear()
+                        await album.done.wait()
+        finally:
+            lock, count = self._locks[conversation]
+            if count > 1:
+                self._locks[conversation] = (lock, count - 1)
+            else:
+                del self._locks[conversation]
+
+    async def run_album_part(
+            self,
+            album: _AlbumTurn,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any],
+    ) -> Any:
+        """
+        Processes a part of an album in the turn taken by the first part.
+        The part doesn't wait for a slot, as the first part already holds one and waits for the parts.
+
+        :param album: The turn of the album.
+        :param handler: The handler function.
+        :param event: The Telegram event.
+        :param data: Additional data.
+        :return: The result of the handler function.
+        """
+        album.parts += 1
+        try:
+            await album.started.wait()
+            return await handler(event, data)
+        finally:
+            album.parts -= 1
+            if album.parts == 0:
+                album.done.set()
+
+    async def run(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any],
+    ) -> Any:
+        """
+        Processes the update once a slot is free.
+
+        :param handler: The handler function.
+        :param event: The Telegram event.
+        :param data: Additional data.
+        :return: The result of the handler function.
+        """
+        if self._semaphore is not None:
+            await self._semaphore.acquire()
+
+        self.running += 1
+        try:
+            return await handler(event, data)
+        finally:
+            self.running -= 1
+            if self._semaphore is not None:
+                self._semaphore.release()
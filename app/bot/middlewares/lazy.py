@@ -0,0 +1,54 @@
+from abc import ABCMeta, abstractmethod
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.types import TelegramObject
+
+
+class LazyMiddleware(BaseMiddleware, metaclass=ABCMeta):
+    """
+    Inner middleware providing a value only to the handlers that declare it as a parameter.
+
+    Inner middlewares run once the handler has been chosen, so the value is not
+    loaded for updates whose handler doesn't use it.
+    """
+
+    KEY: str
+
+    @abstractmethod
+    async def provide(self, event: TelegramObject, data: Dict[str, Any]) -> Any:
+        """
+        Loads the value.
+
+        :param event: The Telegram event.
+        :param data: Additional data.
+        :return: The value passed to the handler.
+        """
+        raise NotImplementedError
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any],
+    ) -> Any:
+        """
+        Call the middleware.
+
+        :param handler: The handler function.
+        :param event: The Telegram event.
+        :param data: Additional data.
+        :return: The result of the handler function.
+        """
+        handler_object: HandlerObject | None = data.get("handler")
+        is_required = (
+            handler_object is None
+            or handler_object.varkw
+            or self.KEY in handler_object.params
+        )
+        if is_required and self.KEY not in data:
+            data[self.KEY] = await self.provide(event, data)
+
+        # Call the handler function with the event and data
+        return await handler(event, data)
@@ -0,0 +1,50 @@
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.dispatcher.middlewares.user_context import EVENT_CONTEXT_KEY, EventContext
+from aiogram.types import TelegramObject, Update
+
+from app.logger import log_context
+
+
+class LogContextMiddleware(BaseMiddleware):
+    """
+    Middleware adding the update being processed to the log records.
+
+    As an outer middleware of the updates it sets the update, the user and the topic,
+    as an inner middleware of the events it adds the name of the handler to a copy of them.
+    The context is not reset after the update, so the error handlers log the update too,
+    each update is processed in its own task.
+    """
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any],
+    ) -> Any:
+        """
+        Call the middleware.
+
+        :param handler: The handler function.
+        :param event: The Telegram event.
+        :param data: Additional data.
+        :return: The result of the handler function.
+        """
+        if isinstance(event, Update):
+            context: Optional[EventContext] = data.get(EVENT_CONTEXT_KEY)
+            log_context.set({
+                "update_id": event.update_id,
+                "user_id": context.user_id if context else None,
+                "thread_id": context.thread_id if context else None,
+            })
+        else:
+            handler_object: Optional[HandlerObject] = data.get("handler")
+            if handler_object is not None:
+                log_context.set({
+                    **(log_context.get() or {}),
+                    "handler": getattr(handler_object.callback, "__name__", None),
+                })
+
+        return await handler(event, data)
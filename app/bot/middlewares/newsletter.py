@@ -0,0 +1,55 @@
+from typing import Any, Dict
+
+from aiogram.fsm.context import FSMContext
+from aiogram.types import TelegramObject, User, Chat
+from aiogram_newsletter.utils.keyboards import InlineKeyboard
+from aiogram_newsletter.utils.texts import TextMessage
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+from app.bot.utils.newsletter import NewsletterManager
+from .lazy import LazyMiddleware
+
+
+class NewsletterMiddleware(LazyMiddleware):
+    """
+    Middleware for passing the NewsletterManager object, which streams recipients from Redis,
+    to the newsletter handlers.
+
+    The manager is created only for the handlers that use it, after the user data middleware,
+    so the other private updates don't read the state data on their own.
+    """
+
+    KEY = "an_manager"
+
+    def __init__(self, apscheduler: AsyncIOScheduler) -> None:
+        """
+        Initializes the NewsletterMiddleware instance.
+
+        :param apscheduler: The apscheduler instance.
+        """
+        self.apscheduler = apscheduler
+
+    async def provide(self, event: TelegramObject, data: Dict[str, Any]) -> NewsletterManager | None:
+        """
+        Creates the newsletter manager.
+
+        :param event: The Telegram event.
+        :param data: Additional data.
+        :return: The newsletter manager, or None outside of private chats.
+        """
+        chat: Chat | None = data.get("event_chat")
+        if chat is None or chat.type != "private":
+            return None
+
+        # Get the language_code from the state data or the user, like aiogram_newsletter does
+        user: User = data.get("event_from_user")
+        state: FSMContext = data.get("state")
+        state_data = await state.get_data()
+        language_code = state_data.get("language_code") or user.language_code
+
+        return NewsletterManager(
+            apscheduler=self.apscheduler,
+            text_message=TextMessage(language_code),
+            inline_keyboard=InlineKeyboard(language_code),
+            data=data,
+        )
@@ -1,29 +1,36 @@
 from typing import Callable, Dict, Any, Awaitable
 
 from aiogram import BaseMiddleware
-from aiogram.types import TelegramObject, User, Chat
+from aiogram.fsm.context import FSMContext
+from aiogram.types import TelegramObject
 from redis.asyncio import Redis
 
-from app.bot.utils.redis import RedisStorage
-from app.bot.utils.redis.models import UserData
-from app.bot.utils.texts import SUPPORTED_LANGUAGES
+from app.bot.utils.fsm import BufferedFSMContext
+from app.bot.utils.redis import RedisStorage, UserCache
 
 
 class RedisMiddleware(BaseMiddleware):
     """
     Middleware for integrating Redis storage with Aiogram.
 
+    It doesn't make any Redis calls by itself: the FSM data is loaded on the first use,
+    and its changes are written once, after the update is processed.
+    The user data is provided by UserDataMiddleware.
+
     Args:
         redis (Redis): The Redis instance for data storage.
+        cache (UserCache | None): The optional in-process user data cache.
     """
 
-    def __init__(self, redis: Redis) -> None:
+    def __init__(self, redis: Redis, cache: UserCache | None = None) -> None:
         """
         Initializes the RedisMiddleware instance.
 
         :param redis: The Redis instance for data storage.
+        :param cache: The optional in-process user data cache.
         """
         self.redis = redis
+        self.storage = RedisStorage(redis, cache)
 
     async def __call__(
             self,
@@ -39,43 +46,20 @@ class RedisMiddleware(BaseMiddleware):
         :param data: Additional data.
         :return: The result of the handler function.
         """
-        # Create an instance of RedisStorage using the provided Redis instance
-        redis = RedisStorage(self.redis)
-
-        # Extract the chat and user objects from data
-        chat: Chat = data.get("event_chat")
-        user: User = data.get("event_from_user")
-
-        # Check if the chat type is private and the user object is not None
-        if chat.type == "private" and user is not None:
-            # Retrieve user data from Redis based on user ID
-            user_redis = await redis.get_user(user.id)
-            user_data = user_redis or UserData(
-                message_thread_id=None,
-                message_silent_id=None,
-                message_silent_mode=False,
-                is_banned=False,
-                id=user.id,
-                full_name=user.full_name,
-                username=f"@{user.username}" if user.username else "-",
-            )
-            if user_redis:
-                user_data.full_name = user.full_name
-                user_data.username = f"@{user.username}" if user.username else "-"
-
-            if len(SUPPORTED_LANGUAGES.keys()) == 1:
-                # If only one language is supported, set user language_code to the first language
-                user_data.language_code = list(SUPPORTED_LANGUAGES.keys())[0]
-
-            # Update user data in Redis
-            await redis.update_user(user.id, user_data)
-        else:
-            # For group chats or if the user object is None, set user_data to None
-            user_data = None
+        # Add redis to data for use in subsequent middlewares and handlers
+        data["redis"] = self.storage
 
-        # Add redis and user_data to data for use in subsequent handlers
-        data["redis"] = redis
-        data["user_data"] = user_data
+        state: FSMContext | None = data.get("state")
+        if state is None:
+            # Call the handler function with the event and data
+            return await handler(event, data)
 
-        # Call the handler function with the event and data
-        return await handler(event, data)
+        # Replace the FSM context with the one keeping the data in memory
+        state = BufferedFSMContext(state.storage, state.key)
+        data["state"] = state
+        try:
+            # Call the handler function with the event and data
+            return await handler(event, data)
+        finally:
+            # Write the FSM data changes made while processing the update
+            await state.flush()
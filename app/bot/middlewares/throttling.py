@@ -1,38 +1,111 @@
-from contextlib import suppress
-from typing import Any, Awaitable, Callable, Dict, MutableMapping, Optional
+import asyncio
+import logging
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List, MutableMapping, Optional
 
-from aiogram import BaseMiddleware
+from aiogram import BaseMiddleware, Bot
 from aiogram.dispatcher.flags import get_flag
-from aiogram.types import TelegramObject, User
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import Message, TelegramObject, User
 from cachetools import TTLCache
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.bot.utils.create_forum_topic import get_or_create_forum_topic, recreate_forum_topic
+
+# Generic cell rate algorithm: a request is allowed if the theoretical arrival time (TAT)
+# doesn't run ahead of the current time by more than the burst, and then moves the TAT by one interval.
+# The time is taken from Redis, so all processes use the same clock.
+# KEYS[1] - TAT key.
+# ARGV[1] - interval between requests in milliseconds, ARGV[2] - number of requests allowed at once.
+GCRA_SCRIPT = """
+local time = redis.call("TIME")
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local interval = tonumber(ARGV[1])
+local tat = math.max(tonumber(redis.call("GET", KEYS[1]) or now), now)
+local new_tat = tat + interval
+if new_tat - now > interval * tonumber(ARGV[2]) then
+    return 0
+end
+redis.call("SET", KEYS[1], new_tat, "PX", new_tat - now)
+return 1
+"""
 
 
 class ThrottlingMiddleware(BaseMiddleware):
     """
     Middleware for handling throttling.
+
+    The limits are checked atomically in Redis with a single round trip, so they are shared by all
+    bot processes. Without Redis, or while it is unavailable, the limits are checked in memory.
+
+    Throttled messages are ignored, except for the handlers with the "throttling_coalesce" flag
+    when coalescing is enabled: their messages are collected per user for a short window
+    and forwarded to the user's forum topic with a single forwardMessages request.
+    The window ends early when the next message of the user is allowed, so the collected messages
+    are forwarded before it, in the order they were sent.
     """
 
+    PREFIX = "throttling"
+    # The maximum number of messages forwarded by one forwardMessages request
+    FORWARD_LIMIT = 100
+
     def __init__(
             self,
+            redis: Redis | None = None,
             *,
+            burst: int = 1,
             default_key: Optional[str] = "default",
             default_ttl: float = 1,
+            coalesce: float = 0,
             **ttl_map: float,
     ) -> None:
         """
         Initialize the ThrottlingMiddleware.
 
+        :param redis: The Redis instance storing the limits or None to keep them in memory.
+        :param burst: The number of messages allowed at once before the throttling starts,
+            the in-memory check always allows one.
         :param default_key: The default key for throttling.
         :param default_ttl: The default time-to-live (TTL) in seconds for the default key.
+        :param coalesce: The number of seconds throttled messages are collected before forwarding,
+            0 disables coalescing.
         :param ttl_map: Mapping of keys to corresponding TTL values.
         """
         if default_key:
             ttl_map[default_key] = default_ttl
+        self.redis = redis
+        self.burst = burst
         self.default_key = default_key
+        self.coalesce = coalesce
+        self.ttl_map = ttl_map
         self.caches: Dict[str, MutableMapping[int, None]] = {}
         for name, ttl in ttl_map.items():
             self.caches[name] = TTLCache(maxsize=10_000, ttl=ttl)
 
+        self._gcra_script = None if redis is None else redis.register_script(GCRA_SCRIPT)
+        # The number of throttled messages by key
+        self.hits: Counter[str] = Counter()
+        # The number of throttled messages forwarded in batches
+        self.coalesced = 0
+
+        # IDs of the collected messages, the tasks forwarding them and the events ending their windows, by user ID
+        self._buffers: Dict[int, List[int]] = {}
+        self._flushes: Dict[int, asyncio.Task] = {}
+        self._wakeups: Dict[int, asyncio.Event] = {}
+        # Set on shutdown to forward the collected messages without waiting for the end of the window
+        self._closing = asyncio.Event()
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """
+        Returns the throttling counters.
+
+        :return: Dictionary with the number of throttled messages by key
+            and the number of coalesced messages.
+        """
+        return {**self.hits, "coalesced": self.coalesced}
+
     async def __call__(
             self,
             handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
@@ -53,14 +126,134 @@ class ThrottlingMiddleware(BaseMiddleware):
             # Get the throttling key from data or use the default key
             throttling_key = get_flag(data, "throttling_key", default=self.default_key)
             # Check if the user is already throttled for the given key
-            if throttling_key and user.id in self.caches[throttling_key]:
-                # Delete the message if it exists
-                with suppress(Exception):
-                    await event.message.delete()
+            if throttling_key and not await self.is_allowed(throttling_key, user.id):
+                self.hits[throttling_key] += 1
+                # Collect the message to forward it later, otherwise it is ignored
+                if self.coalesce > 0 and get_flag(data, "throttling_coalesce"):
+                    self._collect(event, data)
                 return None
 
-            # Add the user to the cache to indicate throttling
-            self.caches[throttling_key][user.id] = None
+            flush = self._flushes.get(user.id)
+            if flush is not None:
+                # Forward the collected messages of the user before the allowed one
+                self._wakeups[user.id].set()
+                await asyncio.shield(flush)
 
         # Call the handler function with the event and data
         return await handler(event, data)
+
+    async def is_allowed(self, key: str, user_id: int) -> bool:
+        """
+        Checks the limit of the user and counts the message if it is allowed.
+
+        :param key: The throttling key.
+        :param user_id: The ID of the user.
+        :return: True if the message is allowed.
+        """
+        if self._gcra_script is not None:
+            try:
+                return bool(await self._gcra_script(
+                    keys=[f"{self.PREFIX}:{key}:{user_id}"],
+                    args=[int(self.ttl_map[key] * 1000), self.burst],
+                ))
+            except RedisError as e:
+                logging.warning(f"Throttling falls back to memory: {e}")
+
+        return self._is_allowed_in_memory(key, user_id)
+
+    def _is_allowed_in_memory(self, key: str, user_id: int) -> bool:
+        """
+        Checks the limit of the user in this process only.
+
+        :param key: The throttling key.
+        :param user_id: The ID of the user.
+        :return: True if the message is allowed.
+        """
+        if user_id in self.caches[key]:
+            return False
+
+        # Add the user to the cache to indicate throttling
+        self.caches[key][user_id] = None
+        return True
+
+    async def flush(self) -> int:
+        """
+        Forwards the collected messages now, on shutdown.
+
+        :return: The number of users whose messages were forwarded.
+        """
+        self._closing.set()
+        for wakeup in self._wakeups.values():
+            wakeup.set()
+        flushes = list(self._flushes.values())
+        await asyncio.gather(*flushes, return_exceptions=True)
+        return len(flushes)
+
+    def _collect(self, message: Message, data: Dict[str, Any]) -> None:
+        """
+        Adds the throttled message, or all messages of its album, to the buffer of the user
+        and schedules forwarding the buffer at the end of the window.
+
+        :param message: The throttled message.
+        :param data: Additional data.
+        """
+        user_id = message.chat.id
+        album = data.get("album")
+        messages = album.messages if album else [message]
+
+        buffer = self._buffers.setdefault(user_id, [])
+        buffer.extend(m.message_id for m in messages)
+
+        if user_id not in self._flushes:
+            wakeup = self._wakeups[user_id] = asyncio.Event()
+            # The messages collected on shutdown are forwarded at once
+            if self._closing.is_set():
+                wakeup.set()
+            self._flushes[user_id] = asyncio.create_task(self._flush(user_id, data, wakeup))
+
+    async def _flush(self, user_id: int, data: Dict[str, Any], wakeup: asyncio.Event) -> None:
+        """
+        Forwards the collected messages of the user to the forum topic at the end of the window.
+
+        :param user_id: The ID of the user.
+        :param data: Additional data of the first collected message.
+        :param wakeup: The event ending the window early.
+        """
+        try:
+            await asyncio.wait_for(wakeup.wait(), self.coalesce)
+        except asyncio.TimeoutError:
+            pass
+        # Take the buffer, the messages throttled from now on start a new window
+        del self._flushes[user_id]
+        del self._wakeups[user_id]
+        message_ids = sorted(self._buffers.pop(user_id, []))
+
+        bot: Bot = data["bot"]
+        redis, config, pool = data["redis"], data["config"], data.get("forum_topic_pool")
+        try:
+            # Read the current user data, the user may have been banned in the meantime
+            user_data = await redis.get_user(user_id)
+            if user_data is None or user_data.is_banned:
+                return
+
+            async def forward_messages() -> None:
+                message_thread_id = await get_or_create_forum_topic(bot, redis, config, user_data, pool)
+                for i in range(0, len(message_ids), self.FORWARD_LIMIT):
+                    await bot.forward_messages(
+                        chat_id=config.bot.GROUP_ID,
+                        from_chat_id=user_id,
+                        message_ids=message_ids[i:i + self.FORWARD_LIMIT],
+                        message_thread_id=message_thread_id,
+                    )
+
+            try:
+                await forward_messages()
+            except TelegramBadRequest as ex:
+                if "message thread not found" not in ex.message:
+                    raise
+                await recreate_forum_topic(bot, redis, config, user_data, pool)
+                await forward_messages()
+            self.coalesced += len(message_ids)
+
+        except Exception as e:
+            logging.exception(f"Failed to forward {len(message_ids)} throttled messages of {user_id}: {e}")
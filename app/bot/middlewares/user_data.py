@@ -0,0 +1,85 @@
+from typing import Dict, Any
+
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.redis import RedisStorage as FSMRedisStorage
+from aiogram.types import TelegramObject, User, Chat
+
+from app.bot.utils.fsm import BufferedFSMContext
+from app.bot.utils.redis import RedisStorage
+from app.bot.utils.redis.models import UserData
+from app.bot.utils.texts import SUPPORTED_LANGUAGES
+from .lazy import LazyMiddleware
+
+
+class UserDataMiddleware(LazyMiddleware):
+    """
+    Middleware for passing the user data of private chats to the handlers that use it.
+
+    The user is created if not found, and the FSM data is read in the same round trip,
+    if it hasn't been loaded yet and is stored in the same Redis.
+    """
+
+    KEY = "user_data"
+
+    def __init__(self) -> None:
+        """
+        Initializes the UserDataMiddleware instance.
+        """
+        # If only one language is supported, it is always used as the user language_code
+        self.default_language_code = (
+            list(SUPPORTED_LANGUAGES.keys())[0] if len(SUPPORTED_LANGUAGES.keys()) == 1 else None
+        )
+
+    async def provide(self, event: TelegramObject, data: Dict[str, Any]) -> UserData | None:
+        """
+        Loads the user data.
+
+        :param event: The Telegram event.
+        :param data: Additional data.
+        :return: The user data or None for group chats or if there is no user.
+        """
+        redis: RedisStorage = data["redis"]
+
+        # Extract the chat, user and state objects from data
+        chat: Chat = data.get("event_chat")
+        user: User = data.get("event_from_user")
+        state: FSMContext | None = data.get("state")
+
+        # Check if the chat type is private and the user object is not None
+        if chat is None or chat.type != "private" or user is None:
+            return None
+
+        # Retrieve user data from Redis based on user ID, creating it if not found
+        new_user_data = UserData(
+            message_thread_id=None,
+            message_silent_id=None,
+            message_silent_mode=False,
+            is_banned=False,
+            id=user.id,
+            full_name=user.full_name,
+            username=f"@{user.username}" if user.username else "-",
+            language_code=self.default_language_code,
+        )
+        if (
+                isinstance(state, BufferedFSMContext)
+                and not state.is_loaded
+                and isinstance(state.storage, FSMRedisStorage)
+                and state.storage.redis is redis.redis
+        ):
+            # Read the FSM data in the same round trip
+            fsm_key = state.storage.key_builder.build(state.key, "data")
+            user_data, created, fsm_value = await redis.get_or_create_user_and_get(new_user_data, fsm_key)
+            state.preload(state.storage.json_loads(fsm_value) if fsm_value is not None else {})
+        else:
+            user_data, created = await redis.get_or_create_user(new_user_data)
+
+        if not created:
+            user_data.full_name = user.full_name
+            user_data.username = f"@{user.username}" if user.username else "-"
+            if self.default_language_code is not None:
+                user_data.language_code = self.default_language_code
+
+        # Update user data in Redis only if something has changed
+        if user_data.is_dirty:
+            await redis.update_user(user.id, user_data)
+        return user_data
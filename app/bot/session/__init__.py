@@ -0,0 +1,46 @@
+from aiogram import Bot
+
+from .rate_limiter import Lane, RateLimiter, lane
+from .retry import RetryMiddleware
+
+
+def register_request_middlewares(bot: Bot, **kwargs) -> RetryMiddleware | None:
+    """
+    Register request middlewares of the bot session.
+
+    Args:
+        bot (Bot): The Aiogram Bot instance.
+        **kwargs: Additional keyword arguments.
+
+    Returns:
+        RetryMiddleware | None: The retry middleware, whose stats are logged on shutdown, if enabled.
+    """
+    config = kwargs["config"]
+
+    # Register RetryMiddleware first, so that every retry passes the rate limiter again
+    retry_middleware = None
+    if config.retry.ATTEMPTS > 0:
+        retry_middleware = RetryMiddleware(
+            attempts=config.retry.ATTEMPTS,
+            max_delay=config.retry.MAX_DELAY,
+        )
+        bot.session.middleware(retry_middleware)
+    # Register RateLimiter to pace outgoing requests
+    if config.rate_limit.ENABLED:
+        bot.session.middleware(
+            RateLimiter(
+                global_rate=config.rate_limit.GLOBAL,
+                chat_rate=config.rate_limit.CHAT,
+                group_rate=config.rate_limit.GROUP / 60,
+            )
+        )
+    return retry_middleware
+
+
+__all__ = [
+    "Lane",
+    "RateLimiter",
+    "RetryMiddleware",
+    "lane",
+    "register_request_middlewares",
+]
@@ -0,0 +1,241 @@
+import asyncio
+import math
+import time
+from collections import deque
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import MutableMapping
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import (
+    CopyMessage,
+    CopyMessages,
+    DeleteMessage,
+    DeleteMessages,
+    EditForumTopic,
+    ForwardMessage,
+    ForwardMessages,
+    PinChatMessage,
+    Response,
+    SendMediaGroup,
+    SendMessage,
+    TelegramMethod,
+    UnpinChatMessage,
+)
+from aiogram.methods.base import TelegramType
+from cachetools import TTLCache
+
+
+class Lane(IntEnum):
+    """
+    Priority lanes of outgoing requests, lower values are sent first.
+    """
+    HIGH = 0
+    NORMAL = 1
+    LOW = 2
+
+
+# Overrides the lane of the requests made in the current context, e.g. by a newsletter task
+lane: ContextVar[Lane | None] = ContextVar("lane", default=None)
+
+# Requests delivering messages between users and operators
+HIGH_METHODS = (ForwardMessage, ForwardMessages, CopyMessage, CopyMessages, SendMediaGroup)
+# Housekeeping requests that can wait
+LOW_METHODS = (DeleteMessage, DeleteMessages, PinChatMessage, UnpinChatMessage, EditForumTopic)
+
+
+class TokenBucket:
+    """
+    Token bucket allowing short bursts up to its capacity and the given average rate.
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        """
+        Initializes the TokenBucket instance.
+
+        :param rate: The number of tokens added per second.
+        :param capacity: The maximum number of tokens.
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def delay(self, now: float) -> float:
+        """
+        Returns the number of seconds until a token is available.
+
+        :param now: The current monotonic time.
+        :return: 0 if a token is available now.
+        """
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return 0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        """
+        Takes a token, must be called only after delay() returned 0.
+        """
+        self.tokens -= 1
+
+
+class RateLimiter(BaseRequestMiddleware):
+    """
+    Request middleware pacing outgoing requests with Telegram's global, per-chat and per-group limits.
+
+    Requests are queued in priority lanes and released by a single scheduler task,
+    which runs only while there are queued requests.
+    """
+
+    def __init__(
+            self,
+            global_rate: float = 30,
+            chat_rate: float = 1,
+            group_rate: float = 20 / 60,
+            max_chats: int = 10_000,
+    ) -> None:
+        """
+        Initializes the RateLimiter instance.
+
+        :param global_rate: The number of requests per second to all chats.
+        :param chat_rate: The number of messages per second to a private chat.
+        :param group_rate: The number of messages per second to a group.
+        :param max_chats: The maximum number of chats whose buckets are kept.
+        """
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        # Idle buckets are full again after a minute, so they can be forgotten
+        self.buckets: MutableMapping[int | str, TokenBucket] = TTLCache(maxsize=max_chats, ttl=60)
+
+        self._lanes: dict[Lane, deque[tuple[int | str | None, asyncio.Future]]] = {
+            lane_: deque() for lane_ in Lane
+        }
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    async def __call__(
+            self,
+            make_request: NextRequestMiddlewareType[TelegramType],
+            bot: Bot,
+            method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        """
+        Waits for the turn of the request and makes it.
+
+        :param make_request: The next request middleware.
+        :param bot: The Bot instance.
+        :param method: The Telegram API method.
+        :return: The response.
+        """
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is not None and not method.__api_method__.startswith("get"):
+            # Only messages count against the per-chat limits
+            is_message = isinstance(method, HIGH_METHODS) or method.__api_method__.startswith("send")
+            await self._acquire(chat_id if is_message else None, self._lane(method))
+        return await make_request(bot, method)
+
+    @staticmethod
+    def _lane(method: TelegramMethod) -> Lane:
+        """
+        Returns the priority lane of the request.
+
+        :param method: The Telegram API method.
+        :return: The lane.
+        """
+        override = lane.get()
+        if override is not None:
+            return override
+        if isinstance(method, HIGH_METHODS):
+            return Lane.HIGH
+        if isinstance(method, LOW_METHODS):
+            return Lane.LOW
+        if isinstance(method, SendMessage) and (method.reply_to_message_id or method.reply_parameters):
+            # Acknowledgements are sent as replies
+            return Lane.LOW
+        return Lane.NORMAL
+
+    async def _acquire(self, chat_id: int | str | None, lane_: Lane) -> None:
+        """
+        Queues the request and waits until it may be sent.
+
+        :param chat_id: The chat whose limit applies or None for the global limit only.
+        :param lane_: The priority lane.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._lanes[lane_].append((chat_id, future))
+        self._wakeup.set()
+        if self._task is None:
+            self._task = asyncio.create_task(self._schedule())
+        await future
+
+    def _bucket(self, chat_id: int | str) -> TokenBucket:
+        """
+        Returns the bucket of a chat, private chats have positive IDs.
+
+        :param chat_id: The chat ID.
+        :return: The token bucket.
+        """
+        bucket = self.buckets.get(chat_id)
+        if bucket is None:
+            if isinstance(chat_id, int) and chat_id > 0:
+                # Allow a short burst of messages, but at least one
+                bucket = TokenBucket(self.chat_rate, max(1.0, self.chat_rate * 3))
+            else:
+                # The group limit is per minute, allow the whole allowance of a minute at once
+                bucket = TokenBucket(self.group_rate, max(1.0, self.group_rate * 60))
+            self.buckets[chat_id] = bucket
+        return bucket
+
+    def _release(self, now: float) -> float | None:
+        """
+        Releases every queued request that may be sent now, in the order of the lanes.
+
+        :param now: The current monotonic time.
+        :return: The number of seconds until the next request may be sent or None if the queue is empty.
+        """
+        delay = math.inf
+        for queue in self._lanes.values():
+            for item in list(queue):
+                chat_id, future = item
+                if future.done():
+                    # The caller is gone
+                    queue.remove(item)
+                    continue
+
+                global_delay = self.global_bucket.delay(now)
+                if global_delay > 0:
+                    return global_delay
+
+                bucket = None if chat_id is None else self._bucket(chat_id)
+                chat_delay = 0 if bucket is None else bucket.delay(now)
+                if chat_delay > 0:
+                    # Requests to other chats may go ahead
+                    delay = min(delay, chat_delay)
+                    continue
+
+                self.global_bucket.take()
+                if bucket is not None:
+                    bucket.take()
+                queue.remove(item)
+                future.set_result(None)
+
+        return None if delay is math.inf else delay
+
+    async def _schedule(self) -> None:
+        """
+        Releases the queued requests until the queue is empty.
+        """
+        try:
+            while True:
+                self._wakeup.clear()
+                delay = self._release(time.monotonic())
+                if delay is None and not any(self._lanes.values()):
+                    break
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._task = None
@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import random
+import time
+from collections import Counter
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import (
+    TelegramEntityTooLarge,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+from aiogram.methods import GetUpdates, Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+
+
+class RetryMiddleware(BaseRequestMiddleware):
+    """
+    Request middleware retrying requests failed with Retry-After, network errors or server errors.
+
+    A Retry-After of a chat holds back all requests to that chat until it expires,
+    and one without a chat holds back all requests. Other errors are retried with
+    an exponential backoff with full jitter.
+
+    Note that a request failed with a network error may have been completed by Telegram,
+    so a retried message may be sent twice.
+    """
+
+    def __init__(self, attempts: int = 3, max_delay: float = 30, backoff: float = 0.5) -> None:
+        """
+        Initializes the RetryMiddleware instance.
+
+        :param attempts: The maximum number of retries of a request.
+        :param max_delay: The maximum number of seconds to wait before a retry,
+            a longer Retry-After is not waited for.
+        :param backoff: The base number of seconds of the exponential backoff.
+        """
+        self.attempts = attempts
+        self.max_delay = max_delay
+        self.backoff = backoff
+
+        # Monotonic time until which the requests are held back, by chat ID, None for all chats
+        self.blocked: dict[int | str | None, float] = {}
+        # The numbers of retries by reason and of requests failed after all retries
+        self.retries: Counter[str] = Counter()
+        self.failures = 0
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """
+        Returns the retry counters.
+
+        :return: Dictionary with the number of retries by reason and the number of failures.
+        """
+        return {**self.retries, "failures": self.failures}
+
+    async def __call__(
+            self,
+            make_request: NextRequestMiddlewareType[TelegramType],
+            bot: Bot,
+            method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        """
+        Makes the request, retrying it on transient errors.
+
+        :param make_request: The next request middleware.
+        :param bot: The Bot instance.
+        :param method: The Telegram API method.
+        :return: The response.
+        """
+        if isinstance(method, GetUpdates):
+            # Polling has its own backoff
+            return await make_request(bot, method)
+
+        chat_id = getattr(method, "chat_id", None)
+        attempt = 0
+        while True:
+            await self._wait(chat_id)
+            try:
+                return await make_request(bot, method)
+
+            except TelegramRetryAfter as ex:
+                reason, delay = "retry_after", ex.retry_after
+                if delay <= self.max_delay:
+                    self.blocked[chat_id] = max(self.blocked.get(chat_id, 0), time.monotonic() + delay)
+                error = ex
+
+            except TelegramEntityTooLarge:
+                raise
+
+            except (TelegramNetworkError, TelegramServerError) as ex:
+                reason = "network" if isinstance(ex, TelegramNetworkError) else "server"
+                delay = random.uniform(0, min(self.max_delay, self.backoff * 2 ** attempt))
+                error = ex
+
+            if attempt >= self.attempts or delay > self.max_delay:
+                self.failures += 1
+                raise error
+
+            attempt += 1
+            self.retries[reason] += 1
+            logging.warning(
+                f"Retrying {method.__api_method__} in {delay:.1f}s "
+                f"(attempt {attempt} of {self.attempts}, {reason}): {error.message}"
+            )
+            await asyncio.sleep(delay)
+
+    async def _wait(self, chat_id: int | str | None) -> None:
+        """
+        Waits until the requests to the chat are no longer held back.
+
+        :param chat_id: The chat ID or None if the request is not sent to a chat.
+        """
+        now = time.monotonic()
+        delay = 0.0
+        for key in {chat_id, None}:
+            until = self.blocked.get(key)
+            if until is None:
+                continue
+            if until <= now:
+                del self.blocked[key]
+            else:
+                delay = max(delay, until - now)
+
+        if delay > 0:
+            await asyncio.sleep(delay)
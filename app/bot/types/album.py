@@ -1,4 +1,4 @@
-from typing import Dict, List, Optional, Type, Union, cast
+from typing import Dict, List, Optional, Tuple, Type, Union, cast
 
 from aiogram import Bot
 from aiogram.methods import SendMediaGroup
@@ -49,18 +49,43 @@ class Album(TelegramObject):
         """
         return [media_type for media_type in INPUT_TYPES if getattr(self, media_type)]
 
+    @property
+    def media(self) -> List[Tuple[str, Media]]:
+        """
+        Get the media of the album with their types, in the order of the messages.
+        Without the messages, the media are taken by type.
+
+        :return: A list of the media types and media.
+        """
+        if not self.messages:
+            return [
+                (media_type, media)
+                for media_type in self.media_types
+                for media in getattr(self, media_type)
+            ]
+
+        media = []
+        for message in self.messages:
+            for media_type in INPUT_TYPES:
+                content = getattr(message, media_type)
+                if content:
+                    # A photo is sent in several sizes, the last one is the largest
+                    media.append((media_type, content[-1] if media_type == "photo" else content))
+                    break
+        return media
+
     @property
     def as_media_group(self) -> List[InputMedia]:
         """
-        Convert the album to a list of InputMedia objects for sending as a media group.
+        Convert the album to a list of InputMedia objects for sending as a media group,
+        in the order the parts were sent, even if the album mixes media types.
 
         :return: A list of InputMedia objects.
         """
         bot = cast(Bot, self.bot)
         group = [
             INPUT_TYPES[media_type](media=media.file_id, parse_mode=bot.default.parse_mode)
-            for media_type in self.media_types
-            for media in getattr(self, media_type)
+            for media_type, media in self.media
         ]
         if group:
             group[0].caption = self.caption
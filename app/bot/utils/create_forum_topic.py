@@ -1,29 +1,40 @@
 import asyncio
 import logging
+from contextlib import suppress
 
 from aiogram import Bot
-from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from aiogram.exceptions import TelegramBadRequest
+from redis.asyncio import Redis
+from redis.exceptions import LockError
 
 from app.config import Config
 from .exceptions import CreateForumTopicException, NotEnoughRightsException, NotAForumException
 from .redis import RedisStorage
 from .redis.models import UserData
 
+# The number of seconds the forum topic lock of a user is held at most
+FORUM_TOPIC_LOCK_TIMEOUT = 60
+
+# Forum topic creations running in this process, by user ID
+_creations: dict[int, asyncio.Task] = {}
+
 
 async def get_or_create_forum_topic(
         bot: Bot,
         redis: RedisStorage,
         config: Config,
         user_data: UserData,
+        pool: "ForumTopicPool | None" = None,
 ) -> int:
     if user_data.message_thread_id is None:
         try:
             # If message_thread_id is not found, create a forum topic
-            message_thread_id = await create_forum_topic(
-                bot, config, user_data.full_name,
+            message_thread_id = await _single_flight(
+                bot, redis, config, user_data, pool,
             )
+            # The topic has been stored while holding the lock
             user_data.message_thread_id = message_thread_id
-            await redis.update_user(user_data.id, user_data)
+            user_data.mark_clean("message_thread_id")
 
         except Exception as e:
             await bot.send_message(config.bot.DEV_ID, str(e))
@@ -32,6 +43,104 @@ async def get_or_create_forum_topic(
     return user_data.message_thread_id
 
 
+async def recreate_forum_topic(
+        bot: Bot,
+        redis: RedisStorage,
+        config: Config,
+        user_data: UserData,
+        pool: "ForumTopicPool | None" = None,
+) -> int:
+    """
+    Replaces the forum topic of the user, e.g. after it has been deleted.
+
+    :param bot: The Aiogram Bot instance.
+    :param redis: The RedisStorage instance.
+    :param config: The configuration object.
+    :param user_data: The user data with the deleted message thread ID.
+    :param pool: The pool of ready forum topics, if enabled.
+
+    :return: The message thread ID of the new forum topic.
+    """
+    message_thread_id = await _single_flight(
+        bot, redis, config, user_data, pool, user_data.message_thread_id,
+    )
+    # The topic has been stored while holding the lock
+    user_data.message_thread_id = message_thread_id
+    user_data.mark_clean("message_thread_id")
+    return message_thread_id
+
+
+async def _single_flight(
+        bot: Bot,
+        redis: RedisStorage,
+        config: Config,
+        user_data: UserData,
+        pool: "ForumTopicPool | None",
+        stale_thread_id: int | None = None,
+) -> int:
+    """
+    Creates at most one forum topic for the user at a time.
+
+    Concurrent calls in this process share the same task, and the task holds
+    a Redis lock, so other bot instances wait for it too. The creation is shielded,
+    so a cancelled caller doesn't cancel it for the others.
+
+    :param bot: The Aiogram Bot instance.
+    :param redis: The RedisStorage instance.
+    :param config: The configuration object.
+    :param user_data: The user data.
+    :param pool: The pool of ready forum topics, if enabled.
+    :param stale_thread_id: The message thread ID that must be replaced, if any.
+
+    :return: The message thread ID of the user's forum topic.
+    """
+    task = _creations.get(user_data.id)
+    if task is None:
+        task = asyncio.create_task(
+            _create_locked(bot, redis, config, user_data, pool, stale_thread_id)
+        )
+        _creations[user_data.id] = task
+        task.add_done_callback(lambda _: _creations.pop(user_data.id, None))
+    return await asyncio.shield(task)
+
+
+async def _create_locked(
+        bot: Bot,
+        redis: RedisStorage,
+        config: Config,
+        user_data: UserData,
+        pool: "ForumTopicPool | None",
+        stale_thread_id: int | None,
+) -> int:
+    """
+    Creates a forum topic for the user while holding the user's Redis lock.
+
+    :param bot: The Aiogram Bot instance.
+    :param redis: The RedisStorage instance.
+    :param config: The configuration object.
+    :param user_data: The user data.
+    :param pool: The pool of ready forum topics, if enabled.
+    :param stale_thread_id: The message thread ID that must be replaced, if any.
+
+    :return: The message thread ID of the user's forum topic.
+    """
+    async with redis.lock(f"forum_topic_{user_data.id}", FORUM_TOPIC_LOCK_TIMEOUT):
+        # Another instance may have created the topic while we were waiting for the lock
+        message_thread_id = await redis.get_message_thread_id(user_data.id)
+        if message_thread_id is not None and message_thread_id != stale_thread_id:
+            return message_thread_id
+
+        message_thread_id = None
+        if pool is not None:
+            # Take a ready topic, it is renamed to the user's name in the background
+            message_thread_id = await pool.claim(user_data.full_name)
+        if message_thread_id is None:
+            message_thread_id = await create_forum_topic(bot, config, user_data.full_name)
+        # Store the topic before releasing the lock, so the waiters can find it
+        await redis.set_fields(user_data.id, message_thread_id=message_thread_id)
+        return message_thread_id
+
+
 async def create_forum_topic(bot: Bot, config: Config, name: str) -> int:
     """
     Creates a forum topic in the specified chat.
@@ -54,12 +163,6 @@ async def create_forum_topic(bot: Bot, config: Config, name: str) -> int:
         )
         return forum_topic.message_thread_id
 
-    except TelegramRetryAfter as ex:
-        # Handle Retry-After exception (rate limiting)
-        logging.warning(ex.message)
-        await asyncio.sleep(ex.retry_after)
-        return await create_forum_topic(bot, config, name)
-
     except TelegramBadRequest as ex:
         if "not enough rights" in ex.message:
             # Raise an exception if the bot doesn't have enough rights
@@ -75,3 +178,125 @@ async def create_forum_topic(bot: Bot, config: Config, name: str) -> int:
     except Exception as ex:
         # Re-raise any other exceptions
         raise ex
+
+
+class ForumTopicPool:
+    """
+    Pool of forum topics created in advance, shared by all bot processes through a Redis list.
+
+    A new user claims a ready topic instead of waiting for its creation, and the topic
+    is renamed to the user's name in the background. The pool is refilled in the background
+    by a single process at a time.
+    """
+
+    NAME = "forum_topics_pool"
+    LOCK_NAME = "lock_forum_topics_pool"
+    TOPIC_NAME = "…"
+
+    def __init__(self, redis: Redis, bot: Bot, config: Config, size: int, interval: float = 60) -> None:
+        """
+        Initializes the ForumTopicPool instance.
+
+        :param redis: The Redis instance storing the pool.
+        :param bot: The Aiogram Bot instance.
+        :param config: The configuration object.
+        :param size: The number of topics kept ready.
+        :param interval: The number of seconds between the refill checks.
+        """
+        self.redis = redis
+        self.bot = bot
+        self.config = config
+        self.size = size
+        self.interval = interval
+
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._renames: set[asyncio.Task] = set()
+
+    async def claim(self, name: str) -> int | None:
+        """
+        Takes a ready topic from the pool and renames it in the background.
+
+        :param name: The new name of the topic.
+        :return: The message thread ID of the topic or None if the pool is empty.
+        """
+        async with self.redis.client() as client:
+            value = await client.lpop(self.NAME)
+        # Refill the pool, whether a topic was taken or the pool ran dry
+        self._wakeup.set()
+        if value is None:
+            return None
+
+        message_thread_id = int(value)
+        task = asyncio.create_task(self._rename(message_thread_id, name))
+        self._renames.add(task)
+        task.add_done_callback(self._renames.discard)
+        return message_thread_id
+
+    async def start(self) -> None:
+        """
+        Starts refilling the pool in the background.
+        """
+        self._task = asyncio.create_task(self._refill_loop())
+
+    async def stop(self) -> None:
+        """
+        Stops refilling the pool and waits for the pending renames.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await asyncio.gather(*self._renames, return_exceptions=True)
+
+    async def _rename(self, message_thread_id: int, name: str) -> None:
+        """
+        Renames a claimed topic.
+
+        :param message_thread_id: The message thread ID of the topic.
+        :param name: The new name of the topic.
+        """
+        try:
+            await self.bot.edit_forum_topic(
+                chat_id=self.config.bot.GROUP_ID,
+                message_thread_id=message_thread_id,
+                name=name[:128],
+            )
+        except Exception as e:
+            logging.exception(e)
+
+    async def _refill_loop(self) -> None:
+        """
+        Refills the pool on every claim and at least once per interval.
+        """
+        while True:
+            self._wakeup.clear()
+            try:
+                await self._refill()
+            except Exception as e:
+                logging.exception(e)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _refill(self) -> None:
+        """
+        Creates the missing topics, unless another process is already doing it.
+        """
+        lock = self.redis.lock(self.LOCK_NAME, timeout=self.interval)
+        if not await lock.acquire(blocking=False):
+            return
+
+        try:
+            async with self.redis.client() as client:
+                missing = self.size - await client.llen(self.NAME)
+                for _ in range(missing):
+                    message_thread_id = await create_forum_topic(self.bot, self.config, self.TOPIC_NAME)
+                    await client.rpush(self.NAME, message_thread_id)
+                    # Keep the lock while the topics are being created
+                    await lock.reacquire()
+        finally:
+            # The lock may have expired while waiting for Telegram
+            with suppress(LockError):
+                await lock.release()
@@ -0,0 +1,181 @@
+import asyncio
+import hashlib
+import logging
+import time
+import traceback
+from dataclasses import dataclass
+from html import escape
+from pathlib import Path
+
+from aiogram import Bot
+from aiogram.types import BufferedInputFile, Update
+from aiogram.utils.markdown import hbold, hcode
+
+from app.bot.session import Lane, lane
+
+# The directory of the application code, its frames locate the errors
+APP_DIR = str(Path(__file__).parents[2])
+
+
+@dataclass
+class ErrorStats:
+    """
+    Occurrences of the errors with the same fingerprint.
+    """
+    name: str
+    location: str
+    # The number of occurrences since the start, and since the last report or digest
+    total: int = 0
+    unreported: int = 0
+    last_report: float = 0.0
+
+
+def get_fingerprint(exception: BaseException) -> tuple[str, str]:
+    """
+    Computes the fingerprint of an exception from its type and the place it was raised at:
+    the deepest frame of the application code, or the deepest frame if there is none.
+
+    :param exception: The exception.
+    :return: The fingerprint and the location of the exception.
+    """
+    frames = traceback.extract_tb(exception.__traceback__)
+    app_frames = [frame for frame in frames if frame.filename.startswith(APP_DIR)]
+    frame = (app_frames or frames or [None])[-1]
+
+    location = "unknown" if frame is None else f"{Path(frame.filename).name}:{frame.lineno} in {frame.name}"
+    name = type(exception).__name__
+    fingerprint = hashlib.sha1(f"{name}:{location}".encode()).hexdigest()[:12]
+    return fingerprint, location
+
+
+class ErrorReporter:
+    """
+    Reports errors to the developer, at most once per fingerprint and interval.
+
+    A report is a single document with the traceback and the update. The repeated errors
+    are counted and sent in a periodic digest, so an incident doesn't flood the bot
+    with hundreds of requests. The errors are counted by each bot process.
+    """
+
+    # Telegram limits the length of a message and of a caption
+    MESSAGE_LIMIT = 4096
+    CAPTION_LIMIT = 1024
+
+    def __init__(self, bot: Bot, chat_id: int, interval: float = 600, digest_interval: float = 3600) -> None:
+        """
+        Initializes the ErrorReporter instance.
+
+        :param bot: The Aiogram Bot instance.
+        :param chat_id: The ID of the chat receiving the reports.
+        :param interval: The minimum number of seconds between the reports of the same error.
+        :param digest_interval: The number of seconds between the digests of the repeated errors.
+        """
+        self.bot = bot
+        self.chat_id = chat_id
+        self.interval = interval
+        self.digest_interval = digest_interval
+
+        self.errors: dict[str, ErrorStats] = {}
+        self._task: asyncio.Task | None = None
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """
+        Returns the error counters.
+
+        :return: Dictionary with the number of occurrences by fingerprint.
+        """
+        return {fingerprint: error.total for fingerprint, error in self.errors.items()}
+
+    async def report(self, exception: BaseException, update: Update, text: str | None = None) -> None:
+        """
+        Counts the error and reports it, unless it has been reported within the interval.
+
+        :param exception: The exception.
+        :param update: The update causing the exception.
+        :param text: The text reported instead of the details of the error, if given.
+        """
+        fingerprint, location = get_fingerprint(exception)
+        error = self.errors.get(fingerprint)
+        if error is None:
+            error = self.errors[fingerprint] = ErrorStats(type(exception).__name__, location)
+        error.total += 1
+
+        now = time.monotonic()
+        if error.last_report and now - error.last_report < self.interval:
+            error.unreported += 1
+            return
+        error.last_report = now
+
+        # Let the support conversations go ahead of the reports
+        lane.set(Lane.LOW)
+        try:
+            if text is not None:
+                await self.bot.send_message(self.chat_id, text)
+                return
+
+            # Send the traceback and the update in a single document
+            details = "".join(traceback.format_exception(exception))
+            details += "\n" + update.model_dump_json(indent=2, exclude_none=True)
+            document = BufferedInputFile(details.encode(), filename=f"error_{fingerprint}.txt")
+
+            header = f"{hbold(error.name)} ({fingerprint}, {escape(location)}):\n"
+            caption = header + hcode(str(exception)[:self.CAPTION_LIMIT - len(header) - 16])
+            await self.bot.send_document(self.chat_id, document, caption=caption)
+        except Exception as e:
+            logging.exception(f"Failed to report {fingerprint}: {e}")
+
+    async def start(self) -> None:
+        """
+        Starts sending the digests in the background.
+        """
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Stops sending the digests, the repeated errors not reported yet are sent now.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.send_digest()
+
+    async def _run(self) -> None:
+        """
+        Sends the digests at the interval.
+        """
+        lane.set(Lane.LOW)
+        while True:
+            await asyncio.sleep(self.digest_interval)
+            await self.send_digest()
+
+    async def send_digest(self) -> None:
+        """
+        Sends the number of the repeated errors since the last digest, with a single message.
+        """
+        repeated = sorted(
+            ((fingerprint, error) for fingerprint, error in self.errors.items() if error.unreported),
+            key=lambda item: item[1].unreported,
+            reverse=True,
+        )
+        if not repeated:
+            return
+
+        text = hbold("Repeated errors:")
+        included = []
+        for fingerprint, error in repeated:
+            line = f"\n{error.unreported}× {hbold(error.name)} ({fingerprint}, {escape(error.location)})"
+            if len(text) + len(line) > self.MESSAGE_LIMIT:
+                break
+            text += line
+            included.append(error)
+
+        try:
+            await self.bot.send_message(self.chat_id, text)
+        except Exception as e:
+            logging.exception(f"Failed to send the error digest: {e}")
+            return
+        # The errors left out of the message are sent with the next digest
+        for error in included:
+            error.unreported = 0
@@ -0,0 +1,95 @@
+from typing import Any, Dict, Optional
+
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import BaseStorage, StorageKey
+
+
+class BufferedFSMContext(FSMContext):
+    """
+    FSMContext keeping the state data of one update in memory.
+
+    The data is loaded on the first use, or preloaded together with other data, reads and updates
+    don't touch the storage, and the changes are written with a single request by flush()
+    when the update is processed. The state itself is read and written directly, as before.
+    """
+
+    def __init__(self, storage: BaseStorage, key: StorageKey) -> None:
+        """
+        Initializes the BufferedFSMContext instance.
+
+        :param storage: The FSM storage.
+        :param key: The storage key of the chat and user.
+        """
+        super().__init__(storage, key)
+        self._data: Dict[str, Any] | None = None
+        self._changed = False
+
+    @property
+    def is_loaded(self) -> bool:
+        """
+        Checks whether the state data has been loaded.
+
+        :return: True if the data is in memory.
+        """
+        return self._data is not None
+
+    def preload(self, data: Dict[str, Any]) -> None:
+        """
+        Sets the state data read from the storage by the caller.
+
+        :param data: The state data.
+        """
+        if self._data is None:
+            self._data = data
+
+    async def _load(self) -> Dict[str, Any]:
+        """
+        Returns the state data, reading it from the storage on the first use.
+
+        :return: The state data.
+        """
+        if self._data is None:
+            self._data = await self.storage.get_data(key=self.key)
+        return self._data
+
+    async def set_data(self, data: Dict[str, Any]) -> None:
+        """
+        Replaces the state data in memory, it is written by flush().
+
+        :param data: The new state data.
+        """
+        self._data = data.copy()
+        self._changed = True
+
+    async def get_data(self) -> Dict[str, Any]:
+        """
+        Returns a copy of the state data, reading it from the storage on the first use.
+
+        :return: The state data.
+        """
+        return (await self._load()).copy()
+
+    async def update_data(
+            self, data: Optional[Dict[str, Any]] = None, **kwargs: Any
+    ) -> Dict[str, Any]:
+        """
+        Updates the state data in memory, it is written by flush().
+
+        :param data: The values to update.
+        :param kwargs: More values to update.
+        :return: A copy of the updated state data.
+        """
+        if data:
+            kwargs.update(data)
+        state_data = await self._load()
+        state_data.update(kwargs)
+        self._changed = True
+        return state_data.copy()
+
+    async def flush(self) -> None:
+        """
+        Writes the changed state data to the storage.
+        """
+        if self._changed:
+            await self.storage.set_data(key=self.key, data=self._data)
+            self._changed = False
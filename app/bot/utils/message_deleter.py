@@ -0,0 +1,156 @@
+import asyncio
+import heapq
+import logging
+import time
+from itertools import groupby
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import Message
+from redis.asyncio import Redis
+
+# Pops the due messages from the sorted set and returns them with the score of the next one.
+# KEYS[1] - sorted set of "chat_id:message_id" members scored by the deletion time.
+# ARGV[1] - current time, ARGV[2] - maximum number of popped members.
+POP_DUE_SCRIPT = """
+local due = redis.call("ZRANGEBYSCORE", KEYS[1], "-inf", ARGV[1], "LIMIT", 0, ARGV[2])
+if #due > 0 then
+    redis.call("ZREM", KEYS[1], unpack(due))
+end
+local next_due = redis.call("ZRANGE", KEYS[1], 0, 0, "WITHSCORES")
+return {due, next_due[2] or ""}
+"""
+
+
+class MessageDeleter:
+    """
+    Deletes messages after a delay, so handlers don't have to wait for it.
+
+    The pending deletions are kept in a heap, or in a Redis sorted set shared by all
+    bot processes if Redis is given, so they survive restarts. Due messages are deleted
+    in batches with a single deleteMessages request per chat.
+    """
+
+    NAME = "messages_to_delete"
+    # Telegram deletes at most 100 messages per request
+    BATCH_SIZE = 100
+    # How often the sorted set is checked for deletions scheduled by other processes
+    POLL_INTERVAL = 1
+    # Messages due within this number of seconds after each other are deleted together
+    COALESCE = 0.5
+
+    def __init__(self, bot: Bot, redis: Redis | None = None) -> None:
+        """
+        Initializes the MessageDeleter instance.
+
+        :param bot: The Aiogram Bot instance.
+        :param redis: The Redis instance for persisting the deletions or None to keep them in memory.
+        """
+        self.bot = bot
+        self.redis = redis
+        self._pop_due_script = None if redis is None else redis.register_script(POP_DUE_SCRIPT)
+
+        self._heap: list[tuple[float, int, int]] = []
+        self._next_due: float | None = None
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    async def delete_later(self, message: Message, delay: float) -> None:
+        """
+        Schedules the deletion of a message.
+
+        :param message: The message to be deleted.
+        :param delay: The number of seconds before the deletion.
+        """
+        due = time.time() + delay
+        if self.redis is None:
+            heapq.heappush(self._heap, (due, message.chat.id, message.message_id))
+        else:
+            async with self.redis.client() as client:
+                await client.zadd(self.NAME, {f"{message.chat.id}:{message.message_id}": due})
+        if self._next_due is None or due + self.COALESCE < self._next_due:
+            # The message is due well before the loop wakes up
+            self._wakeup.set()
+
+    async def start(self) -> None:
+        """
+        Starts deleting the due messages in the background.
+        """
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Stops deleting messages. Deletions kept in memory are done right away, as they would be lost.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+        if self._heap:
+            messages = [(chat_id, message_id) for _, chat_id, message_id in self._heap]
+            self._heap.clear()
+            await self._delete(messages)
+
+    async def _run(self) -> None:
+        """
+        Deletes the due messages and sleeps until the next one is due.
+        """
+        while True:
+            self._wakeup.clear()
+            try:
+                messages, delay = await self._pop_due()
+                await self._delete(messages)
+            except Exception as e:
+                logging.exception(e)
+                messages, delay = [], self.POLL_INTERVAL
+
+            if len(messages) == self.BATCH_SIZE:
+                # More messages may be due already
+                continue
+            if messages and delay is not None:
+                # Let the messages due soon accumulate into a batch
+                delay = max(delay, self.COALESCE)
+            if self.redis is not None:
+                delay = self.POLL_INTERVAL if delay is None else min(delay, self.POLL_INTERVAL)
+            self._next_due = None if delay is None else time.time() + delay
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _pop_due(self) -> tuple[list[tuple[int, int]], float | None]:
+        """
+        Takes the due messages.
+
+        :return: The pairs of chat ID and message ID, and the number of seconds until
+            the next message is due or None if there are no pending deletions.
+        """
+        now = time.time()
+        if self.redis is None:
+            messages = []
+            while self._heap and self._heap[0][0] <= now and len(messages) < self.BATCH_SIZE:
+                _, chat_id, message_id = heapq.heappop(self._heap)
+                messages.append((chat_id, message_id))
+            return messages, self._heap[0][0] - now if self._heap else None
+
+        due, next_due = await self._pop_due_script(keys=[self.NAME], args=[now, self.BATCH_SIZE])
+        messages = [tuple(map(int, member.split(b":"))) for member in due]
+        return messages, float(next_due) - now if next_due else None
+
+    async def _delete(self, messages: list[tuple[int, int]]) -> None:
+        """
+        Deletes messages with one request per chat and batch.
+
+        :param messages: The pairs of chat ID and message ID.
+        """
+        for chat_id, group in groupby(sorted(messages), key=lambda item: item[0]):
+            message_ids = [message_id for _, message_id in group]
+            for i in range(0, len(message_ids), self.BATCH_SIZE):
+                try:
+                    await self.bot.delete_messages(chat_id, message_ids[i:i + self.BATCH_SIZE])
+                except TelegramBadRequest:
+                    # The messages have already been deleted or are too old
+                    pass
+                except Exception as e:
+                    logging.exception(e)
@@ -0,0 +1,132 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+from aiogram import Bot
+from aiogram.types import Message, User
+from aiogram_newsletter.manager import ANManager
+from aiogram_newsletter.utils.misc import send_message
+from aiogram_newsletter.utils.states import ANState
+from aiogram_newsletter.utils.texts import TextMessage
+
+from app.bot.session import Lane, lane
+from .redis import RedisStorage
+
+# The newsletters being sent by this process, waited for on shutdown
+_running: set[asyncio.Task] = set()
+
+
+class NewsletterManager(ANManager):
+    """
+    ANManager that keeps only the number of recipients in the FSM context instead of the list of their IDs.
+    The recipients are read from Redis when the newsletter is sent.
+    """
+
+    async def newsletter_menu(
+            self,
+            users_total: int,
+            return_callback: Callable[..., Awaitable],
+    ) -> Message:
+        """
+        Open the newsletter menu.
+
+        :param users_total: The number of recipients shown in the menu.
+        :param return_callback: The callback for returning from the menu.
+        :return: The sent message.
+        """
+        await self.data_storage.set_data(return_callback, "return_callback")
+        await self.state.update_data(users_total=users_total, page=1)
+        return await self.open_newsletters_window()
+
+    async def open_newsletters_window(self) -> Message:
+        """
+        Display the window with the list of scheduled newsletters.
+
+        :return: The sent message.
+        """
+        state_data = await self.state.get_data()
+        page, page_size = state_data.get("page", 1), 5
+        items = sorted(
+            [
+                (job.trigger.run_date.strftime("%Y-%m-%d %H:%M"), f"id:{job.id}")
+                for job in self.apscheduler.get_jobs()
+            ],
+            key=lambda x: x[0],
+        )
+        page_items = items[(page - 1) * page_size: page * page_size]
+        total_pages = (len(items) + page_size - 1) // page_size
+        text = self.text_message.get("newsletters")
+        reply_markup = self.inline_keyboard.newsletters(page_items, page, total_pages)
+        text = text.format(total=state_data.get("users_total", 0))
+        message = await self.send_message(text, reply_markup=reply_markup)
+        await self.state.set_state(ANState.newsletters)
+        return message
+
+
+async def run_newsletter_task(user_data: dict, message_data: dict, batch_size: int = 500) -> None:
+    """
+    Sends the newsletter message to all users, streaming their IDs from Redis in batches.
+
+    The task may be stored in the apscheduler job store, so it receives only serializable
+    arguments and takes the bot and the storage from the event loop, like aiogram_newsletter does.
+
+    :param user_data: The dumped User who created the newsletter.
+    :param message_data: The dumped newsletter Message.
+    :param batch_size: The number of user IDs fetched from Redis at once.
+    """
+    loop = asyncio.get_running_loop()
+    bot: Bot = loop.__getattribute__("bot")
+    redis: RedisStorage = loop.__getattribute__("redis_storage")
+    # Let the support conversations go ahead of the newsletter
+    lane.set(Lane.LOW)
+
+    user = User(**user_data)
+    text_message = TextMessage(user.language_code)
+
+    task = asyncio.current_task()
+    _running.add(task)
+    successful, unsuccessful = 0, 0
+    try:
+        text = text_message.get("newsletter_started")
+        await bot.send_message(user.id, text=text)
+
+        async for user_id in redis.iter_users_ids(batch_size):
+            if await send_message(bot, user_id, message_data):
+                successful += 1
+            else:
+                unsuccessful += 1
+
+        text = text_message.get("newsletter_ended")
+        text = text.format(total=successful + unsuccessful, successful=successful, unsuccessful=unsuccessful)
+        await bot.send_message(user.id, text=text)
+    except asyncio.CancelledError:
+        logging.warning(
+            f"Newsletter of user {user.id} interrupted after {successful + unsuccessful} recipients: "
+            f"{successful} successful, {unsuccessful} unsuccessful"
+        )
+        raise
+    finally:
+        _running.discard(task)
+
+
+async def wait_newsletters(timeout: float) -> dict[str, int]:
+    """
+    Waits for the newsletters being sent, the ones not sent within the timeout are cancelled.
+
+    :param timeout: The maximum number of seconds to wait.
+    :return: Dictionary with the numbers of newsletters completed while waiting and abandoned.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+
+    # The newsletters started while waiting are waited for too
+    completed = 0
+    while _running:
+        done, pending = await asyncio.wait(set(_running), timeout=max(deadline - loop.time(), 0))
+        completed += len(done)
+        if pending:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            return {"completed": completed, "abandoned": len(pending)}
+    return {"completed": completed, "abandoned": 0}
@@ -1,5 +1,7 @@
+from .cache import UserCache
 from .redis import RedisStorage
 
 __all__ = [
     "RedisStorage",
+    "UserCache",
 ]
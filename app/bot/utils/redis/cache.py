@@ -0,0 +1,154 @@
+import asyncio
+import logging
+import uuid
+from dataclasses import replace
+from typing import MutableMapping
+
+from cachetools import TTLCache
+from redis.asyncio import Redis
+from redis.exceptions import ConnectionError
+
+from .models import UserData
+
+
+class UserCache:
+    """
+    In-process LRU cache of user data with a TTL, invalidated across processes through Redis pub/sub.
+
+    Every write publishes the user ID to the invalidation channel, and every process
+    subscribed to it evicts the user from its own cache.
+    """
+
+    CHANNEL = "users_invalidate"
+
+    def __init__(self, redis: Redis, maxsize: int = 10_000, ttl: float = 300) -> None:
+        """
+        Initializes the UserCache instance.
+
+        :param redis: The Redis instance used for pub/sub.
+        :param maxsize: The maximum number of cached users.
+        :param ttl: The time-to-live in seconds for the cache entries.
+        """
+        self.redis = redis
+        self.instance_id = uuid.uuid4().hex
+
+        self.users: MutableMapping[int, UserData] = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.threads: MutableMapping[int, int] = TTLCache(maxsize=maxsize, ttl=ttl)
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+        self._task: asyncio.Task | None = None
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """
+        Returns the cache counters.
+
+        :return: Dictionary with hits, misses, invalidations and the current size.
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "size": len(self.users),
+        }
+
+    def get(self, id_: int) -> UserData | None:
+        """
+        Retrieves a copy of the cached user data.
+
+        :param id_: The ID of the user.
+        :return: The user data or None on a cache miss.
+        """
+        data = self.users.get(id_)
+        if data is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return replace(data)
+
+    def get_by_message_thread_id(self, message_thread_id: int) -> UserData | None:
+        """
+        Retrieves a copy of the cached user data based on message thread ID.
+
+        :param message_thread_id: The ID of the message thread.
+        :return: The user data or None on a cache miss.
+        """
+        id_ = self.threads.get(message_thread_id)
+        data = None if id_ is None else self.users.get(id_)
+        if data is None or data.message_thread_id != message_thread_id:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return replace(data)
+
+    def set(self, data: UserData) -> None:
+        """
+        Stores a copy of the user data.
+
+        :param data: The user data.
+        """
+        self.users[data.id] = replace(data)
+        if data.message_thread_id is not None:
+            self.threads[data.message_thread_id] = data.id
+
+    def invalidate(self, id_: int) -> None:
+        """
+        Evicts the user from the cache.
+
+        :param id_: The ID of the user.
+        """
+        data = self.users.pop(id_, None)
+        if data is not None and data.message_thread_id is not None:
+            self.threads.pop(data.message_thread_id, None)
+        self.invalidations += 1
+
+    def message(self, id_: int) -> str:
+        """
+        Builds the invalidation message published on writes.
+
+        :param id_: The ID of the user.
+        :return: The message for the invalidation channel.
+        """
+        return f"{self.instance_id}:{id_}"
+
+    async def start(self) -> None:
+        """
+        Starts listening to the invalidation channel in the background.
+        """
+        self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        """
+        Stops listening to the invalidation channel.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        logging.info(f"User cache stats: {self.stats}")
+
+    async def _listen(self) -> None:
+        """
+        Evicts users published by other processes. The cache is cleared whenever
+        the subscription is (re)established, since messages may have been missed.
+        """
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self.CHANNEL)
+                    self.users.clear()
+                    self.threads.clear()
+
+                    async for message in pubsub.listen():
+                        if message["type"] != "message":
+                            continue
+                        instance_id, id_ = message["data"].decode().split(":")
+                        if instance_id != self.instance_id:
+                            self.invalidate(int(id_))
+
+            except (ConnectionError, OSError) as ex:
+                logging.warning(f"User cache subscription lost: {ex}")
+                await asyncio.sleep(1)
@@ -0,0 +1,14 @@
+import json
+
+from .models import UserData
+
+
+def decode(data: bytes) -> UserData:
+    """
+    Decodes a JSON record of the legacy "users" hash, which is converted into per-user hashes.
+
+    :param data: The JSON record.
+    :return: The user data.
+    :raises ValueError: If the record is not valid JSON.
+    """
+    return UserData(**json.loads(data))
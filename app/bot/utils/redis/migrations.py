@@ -0,0 +1,175 @@
+import logging
+
+from redis.asyncio import Redis
+
+from .codec import decode
+from .models import UserData
+from .redis import RedisStorage
+
+# The hash with serialized user records, used before the per-user hash layout.
+LEGACY_NAME = "users"
+
+
+async def migrate_thread_index(redis: Redis, batch_size: int = 500) -> int:
+    """
+    Moves the legacy per-thread "users_index_<thread_id>" hashes into the single "users_index" hash.
+
+    Keys are processed with SCAN in batches, so the keyspace is never loaded into memory at once.
+    An entry is kept only if the user's record still points to that thread, stale entries are dropped.
+    The legacy keys are deleted once their batch has been converted.
+
+    :param redis: The Redis instance.
+    :param batch_size: The number of legacy keys processed per batch.
+    :return: The number of entries written to the new index.
+    """
+    pattern = f"{RedisStorage.INDEX_NAME}_*"
+    migrated = 0
+
+    async with redis.client() as client:
+        batch: list[bytes] = []
+        async for key in client.scan_iter(match=pattern, count=batch_size):
+            batch.append(key)
+            if len(batch) >= batch_size:
+                migrated += await _migrate_thread_index_batch(client, batch)
+                batch.clear()
+        if batch:
+            migrated += await _migrate_thread_index_batch(client, batch)
+
+    return migrated
+
+
+async def _migrate_thread_index_batch(client: Redis, keys: list[bytes]) -> int:
+    """
+    Converts a batch of legacy index keys.
+
+    :param client: The Redis client.
+    :param keys: The legacy index keys.
+    :return: The number of entries written to the new index.
+    """
+    prefix_length = len(RedisStorage.INDEX_NAME) + 1
+    candidates: list[tuple[int, int]] = []
+
+    async with client.pipeline(transaction=False) as pipe:
+        for key in keys:
+            pipe.hkeys(key)
+        results = await pipe.execute()
+
+    for key, user_ids in zip(keys, results):
+        thread_id = key[prefix_length:].decode()
+        if not thread_id.isdigit():
+            # Skip keys like "users_index_None" left for users without a topic
+            continue
+        candidates.extend((int(thread_id), int(user_id)) for user_id in user_ids)
+
+    async with client.pipeline(transaction=False) as pipe:
+        for _, user_id in candidates:
+            pipe.hget(LEGACY_NAME, user_id)
+        records = await pipe.execute()
+
+    entries = {
+        thread_id: user_id
+        for (thread_id, user_id), record in zip(candidates, records)
+        if record is not None and decode(record).message_thread_id == thread_id
+    }
+
+    async with client.pipeline(transaction=True) as pipe:
+        if entries:
+            pipe.hset(RedisStorage.INDEX_NAME, mapping=entries)
+        pipe.delete(*keys)
+        await pipe.execute()
+
+    logging.info(f"Migrated {len(entries)} of {len(candidates)} thread index entries from {len(keys)} keys")
+    return len(entries)
+
+
+async def migrate_layout(redis: Redis, batch_size: int = 500) -> int:
+    """
+    Moves user records from the legacy "users" hash into per-user hashes.
+
+    The JSON records are read with HSCAN in batches and removed from the legacy hash
+    once converted. Users that already have a per-user hash get the legacy fields merged into it.
+    The users ids set and the thread index are filled from the records.
+
+    :param redis: The Redis instance.
+    :param batch_size: The number of records processed per batch.
+    :return: The number of converted records.
+    """
+    migrated = 0
+
+    async with redis.client() as client:
+        batch: list[tuple[bytes, bytes]] = []
+        async for user_id, record in client.hscan_iter(LEGACY_NAME, count=batch_size):
+            batch.append((user_id, record))
+            if len(batch) >= batch_size:
+                migrated += await _migrate_layout_batch(client, batch)
+                batch.clear()
+        if batch:
+            migrated += await _migrate_layout_batch(client, batch)
+
+    return migrated
+
+
+async def _migrate_layout_batch(client: Redis, records: list[tuple[bytes, bytes]]) -> int:
+    """
+    Converts a batch of legacy user records.
+
+    A per-user hash may have been created by the bot before the migration ran,
+    the legacy record is merged into it then: the legacy topic and ban win,
+    the legacy language is kept if the user hasn't chosen one since.
+
+    :param client: The Redis client.
+    :param records: The pairs of user ID and legacy record.
+    :return: The number of created or merged per-user hashes.
+    """
+    users = [decode(record) for _, record in records]
+
+    async with client.pipeline(transaction=False) as pipe:
+        for user_data in users:
+            pipe.hgetall(f"{RedisStorage.USER_PREFIX}{user_data.id}")
+        hashes = await pipe.execute()
+
+    merged = 0
+    async with client.pipeline(transaction=True) as pipe:
+        for user_data, current_hash in zip(users, hashes):
+            key = f"{RedisStorage.USER_PREFIX}{user_data.id}"
+            if not current_hash:
+                mapping = user_data.to_mapping()
+                pipe.hset(key, mapping={name: value for name, value in mapping.items() if value is not None})
+                pipe.sadd(RedisStorage.IDS_NAME, user_data.id)
+                if user_data.message_thread_id is not None:
+                    pipe.hset(RedisStorage.INDEX_NAME, user_data.message_thread_id, user_data.id)
+                continue
+
+            current = UserData.from_mapping(current_hash)
+            fields = {"created_at"}
+            if user_data.message_thread_id is not None:
+                fields |= {"message_thread_id", "message_silent_id", "message_silent_mode"}
+            if user_data.is_banned:
+                fields.add("is_banned")
+            if current.language_code is None:
+                fields.add("language_code")
+
+            mapping = {name: value for name, value in user_data.to_mapping().items() if name in fields}
+            set_fields = {name: value for name, value in mapping.items() if value is not None}
+            if set_fields:
+                pipe.hset(key, mapping=set_fields)
+            removed_fields = [name for name, value in mapping.items() if value is None]
+            if removed_fields:
+                pipe.hdel(key, *removed_fields)
+
+            if user_data.message_thread_id is not None and user_data.message_thread_id != current.message_thread_id:
+                # The topic created before the migration is replaced by the legacy one
+                if current.message_thread_id is not None:
+                    pipe.hdel(RedisStorage.INDEX_NAME, current.message_thread_id)
+                    logging.warning(
+                        f"User {user_data.id} got topic {current.message_thread_id} before the migration, "
+                        f"the legacy topic {user_data.message_thread_id} is kept"
+                    )
+                pipe.hset(RedisStorage.INDEX_NAME, user_data.message_thread_id, user_data.id)
+            merged += 1
+
+        pipe.hdel(LEGACY_NAME, *(user_id for user_id, _ in records))
+        await pipe.execute()
+
+    logging.info(f"Converted {len(records) - merged} and merged {merged} of {len(records)} user records")
+    return len(records)
@@ -1,5 +1,6 @@
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, fields, MISSING
 from datetime import datetime, timezone, timedelta
+from typing import Any, Callable, get_args
 
 
 @dataclass
@@ -17,10 +18,123 @@ class UserData:
     language_code: str | None = None
     created_at: str = datetime.now(timezone(timedelta(hours=3))).strftime("%Y-%m-%d %H:%M:%S %Z")
 
+    def __post_init__(self) -> None:
+        """
+        Starts tracking changes once all fields are initialized.
+        """
+        object.__setattr__(self, "_dirty", {})
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        """
+        Sets an attribute and remembers the original value of a changed field.
+
+        :param name: The name of the attribute.
+        :param value: The new value.
+        """
+        dirty: dict | None = self.__dict__.get("_dirty")
+        if dirty is not None and name in self.__dataclass_fields__:
+            old_value = getattr(self, name)
+            if name in dirty:
+                if dirty[name] == value:
+                    # The field is back to its original value
+                    del dirty[name]
+            elif old_value != value:
+                dirty[name] = old_value
+        object.__setattr__(self, name, value)
+
+    @property
+    def is_dirty(self) -> bool:
+        """
+        Checks whether any field has changed since the object was loaded or saved.
+
+        :return: True if there are unsaved changes.
+        """
+        return bool(self._dirty)
+
+    @property
+    def dirty_fields(self) -> dict[str, Any]:
+        """
+        Returns the changed fields mapped to their original values.
+
+        :return: Dictionary of field names and their original values.
+        """
+        return dict(self._dirty)
+
+    def mark_clean(self, *names: str) -> None:
+        """
+        Forgets the tracked changes, e.g. after the object has been saved.
+
+        :param names: The names of the saved fields, all fields if none are given.
+        """
+        if not names:
+            self._dirty.clear()
+        for name in names:
+            self._dirty.pop(name, None)
+
     def to_dict(self) -> dict:
         """
         Converts UserData object to a dictionary.
+        All fields are scalars, so a shallow copy is enough.
 
         :return: Dictionary representation of UserData.
         """
-        return asdict(self)
+        return {name: getattr(self, name) for name in self.__dataclass_fields__}
+
+    @staticmethod
+    def encode_value(value: Any) -> str | None:
+        """
+        Encodes a field value for storing in a Redis hash.
+
+        :param value: The field value.
+        :return: The encoded value or None if the field should be removed from the hash.
+        """
+        if value is None:
+            return None
+        if isinstance(value, bool):
+            return "1" if value else "0"
+        return str(value)
+
+    def to_mapping(self) -> dict[str, str | None]:
+        """
+        Converts UserData object to a Redis hash mapping.
+
+        :return: Dictionary of encoded field values, None values mean absent fields.
+        """
+        return {name: self.encode_value(getattr(self, name)) for name in self.__dataclass_fields__}
+
+    @classmethod
+    def from_mapping(cls, mapping: dict[bytes, bytes]) -> "UserData":
+        """
+        Creates UserData object from a Redis hash mapping.
+        Absent fields get their default value or None.
+
+        :param mapping: The Redis hash mapping.
+        :return: UserData object.
+        """
+        values = {}
+        for name, (default, parse) in _DECODERS.items():
+            value = mapping.get(name.encode())
+            values[name] = default if value is None else parse(value)
+        return cls(**values)
+
+
+def _parser(type_: Any) -> Callable[[bytes], Any]:
+    """
+    Returns the function decoding a Redis hash value of the given field type.
+
+    :param type_: The field type annotation.
+    :return: The decoding function.
+    """
+    types = get_args(type_) or (type_,)
+    if bool in types:
+        return lambda value: value == b"1"
+    if int in types:
+        return int
+    return bytes.decode
+
+
+_DECODERS = {
+    field.name: (None if field.default is MISSING else field.default, _parser(field.type))
+    for field in fields(UserData)
+}
+
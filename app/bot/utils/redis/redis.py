@@ -1,76 +1,172 @@
-import json
+from typing import Any, AsyncIterator
 
 from redis.asyncio import Redis
+from redis.asyncio.lock import Lock
+from redis.exceptions import NoScriptError
 
+from .cache import UserCache
 from .models import UserData
 
+# Returns the stored record or, if there is none, stores the given one.
+# KEYS[1] - user hash, KEYS[2] - users ids set, KEYS[3] - index hash.
+# ARGV[1] - user id, ARGV[2] - message thread id (or empty string), ARGV[3:] - field/value pairs.
+GET_OR_CREATE_SCRIPT = """
+local data = redis.call("HGETALL", KEYS[1])
+if #data > 0 then
+    return data
+end
+redis.call("HSET", KEYS[1], unpack(ARGV, 3))
+redis.call("SADD", KEYS[2], ARGV[1])
+if ARGV[2] ~= "" then
+    redis.call("HSET", KEYS[3], ARGV[2], ARGV[1])
+end
+return false
+"""
+
+# Returns the record of the user who owns the message thread.
+# KEYS[1] - index hash.
+# ARGV[1] - message thread id, ARGV[2] - user hash name prefix.
+GET_BY_MESSAGE_THREAD_ID_SCRIPT = """
+local user_id = redis.call("HGET", KEYS[1], ARGV[1])
+if not user_id then
+    return false
+end
+return redis.call("HGETALL", ARGV[2] .. user_id)
+"""
+
+# Sets and removes fields of an existing user and keeps the index in sync.
+# KEYS[1] - user hash, KEYS[2] - index hash.
+# ARGV[1] - user id, ARGV[2] - invalidation channel (or empty string), ARGV[3] - invalidation message,
+# ARGV[4] - number of field/value pairs N, ARGV[5:5+2N] - field/value pairs, the rest - fields to remove.
+SET_FIELDS_SCRIPT = """
+if redis.call("EXISTS", KEYS[1]) == 0 then
+    return 0
+end
+local pairs_end = 4 + 2 * tonumber(ARGV[4])
+
+local thread_id
+for i = 5, pairs_end, 2 do
+    if ARGV[i] == "message_thread_id" then thread_id = ARGV[i + 1] end
+end
+for i = pairs_end + 1, #ARGV do
+    if ARGV[i] == "message_thread_id" then thread_id = "" end
+end
+if thread_id then
+    local old_thread_id = redis.call("HGET", KEYS[1], "message_thread_id")
+    if old_thread_id and redis.call("HGET", KEYS[2], old_thread_id) == ARGV[1] then
+        redis.call("HDEL", KEYS[2], old_thread_id)
+    end
+    if thread_id ~= "" then
+        redis.call("HSET", KEYS[2], thread_id, ARGV[1])
+    end
+end
+
+if pairs_end >= 5 then
+    redis.call("HSET", KEYS[1], unpack(ARGV, 5, pairs_end))
+end
+if #ARGV > pairs_end then
+    redis.call("HDEL", KEYS[1], unpack(ARGV, pairs_end + 1))
+end
+if ARGV[2] ~= "" then
+    redis.call("PUBLISH", ARGV[2], ARGV[3])
+end
+return 1
+"""
+
+# Inverts a boolean field of an existing user and returns the new value.
+# KEYS[1] - user hash.
+# ARGV[1] - field, ARGV[2] - invalidation channel (or empty string), ARGV[3] - invalidation message.
+TOGGLE_SCRIPT = """
+if redis.call("EXISTS", KEYS[1]) == 0 then
+    return false
+end
+local value = redis.call("HGET", KEYS[1], ARGV[1]) == "1" and "0" or "1"
+redis.call("HSET", KEYS[1], ARGV[1], value)
+if ARGV[2] ~= "" then
+    redis.call("PUBLISH", ARGV[2], ARGV[3])
+end
+return value
+"""
+
 
 class RedisStorage:
     """Class for managing user data storage using Redis."""
 
-    NAME = "users"
+    IDS_NAME = "users_ids"
+    INDEX_NAME = "users_index"
+    USER_PREFIX = "user_"
+    LOCK_PREFIX = "lock_"
 
-    def __init__(self, redis: Redis) -> None:
+    def __init__(self, redis: Redis, cache: UserCache | None = None) -> None:
         """
         Initializes the RedisStorage instance.
 
+        Each user is stored in its own Redis hash, so single fields can be changed
+        atomically without rewriting the whole record.
+
         :param redis: The Redis instance to be used for data storage.
+        :param cache: The optional in-process cache placed in front of Redis.
         """
         self.redis = redis
+        self.cache = cache
+        self._get_or_create_script = redis.register_script(GET_OR_CREATE_SCRIPT)
+        self._get_by_message_thread_id_script = redis.register_script(GET_BY_MESSAGE_THREAD_ID_SCRIPT)
+        self._set_fields_script = redis.register_script(SET_FIELDS_SCRIPT)
+        self._toggle_script = redis.register_script(TOGGLE_SCRIPT)
 
-    async def _get(self, name: str, key: str | int) -> bytes | None:
+    def _user_key(self, id_: int) -> str:
         """
-        Retrieves data from Redis.
+        Returns the name of the user hash.
 
-        :param name: The name of the Redis hash.
-        :param key: The key to be retrieved.
-        :return: The retrieved data or None if not found.
+        :param id_: The ID of the user.
+        :return: The name of the Redis hash.
         """
-        async with self.redis.client() as client:
-            return await client.hget(name, key)
+        return f"{self.USER_PREFIX}{id_}"
 
-    async def _set(self, name: str, key: str | int, value: any) -> None:
+    def _invalidation_args(self, id_: int) -> list[str]:
         """
-        Sets data in Redis.
+        Returns the script arguments for publishing a cache invalidation.
 
-        :param name: The name of the Redis hash.
-        :param key: The key to be set.
-        :param value: The value to be set.
+        :param id_: The ID of the user.
+        :return: The channel and the message, or empty strings if the cache is disabled.
         """
-        async with self.redis.client() as client:
-            await client.hset(name, key, value)
+        if self.cache is None:
+            return ["", ""]
+        return [self.cache.CHANNEL, self.cache.message(id_)]
 
-    async def _update_index(self, message_thread_id: int, user_id: int) -> None:
+    @staticmethod
+    def _to_mapping(data: list[bytes]) -> dict[bytes, bytes]:
         """
-        Updates the user index in Redis.
+        Converts a flat HGETALL reply returned by a script to a dictionary.
 
-        :param message_thread_id: The ID of the message thread.
-        :param user_id: The ID of the user to be updated in the index.
+        :param data: The flat list of fields and values.
+        :return: The dictionary of fields and values.
         """
-        index_key = f"{self.NAME}_index_{message_thread_id}"
-        await self._set(index_key, user_id, "1")
+        return dict(zip(data[::2], data[1::2]))
 
     async def get_by_message_thread_id(self, message_thread_id: int) -> UserData | None:
         """
-        Retrieves user data based on message thread ID.
+        Retrieves user data based on message thread ID in a single round trip.
 
         :param message_thread_id: The ID of the message thread.
         :return: The user data or None if not found.
         """
-        user_id = await self._get_user_id_by_message_thread_id(message_thread_id)
-        return None if user_id is None else await self.get_user(user_id)
+        if self.cache is not None:
+            user_data = self.cache.get_by_message_thread_id(message_thread_id)
+            if user_data is not None:
+                return user_data
 
-    async def _get_user_id_by_message_thread_id(self, message_thread_id: int) -> int | None:
-        """
-        Retrieves user ID based on message thread ID.
+        data = await self._get_by_message_thread_id_script(
+            keys=[self.INDEX_NAME],
+            args=[message_thread_id, self.USER_PREFIX],
+        )
+        if not data:
+            return None
 
-        :param message_thread_id: The ID of the message thread.
-        :return: The user ID or None if not found.
-        """
-        index_key = f"{self.NAME}_index_{message_thread_id}"
-        async with self.redis.client() as client:
-            user_ids = await client.hkeys(index_key)
-            return int(user_ids[0]) if user_ids else None
+        user_data = UserData.from_mapping(self._to_mapping(data))
+        if self.cache is not None:
+            self.cache.set(user_data)
+        return user_data
 
     async def get_user(self, id_: int) -> UserData | None:
         """
@@ -79,29 +175,210 @@ class RedisStorage:
         :param id_: The ID of the user.
         :return: The user data or None if not found.
         """
-        data = await self._get(self.NAME, id_)
-        if data is not None:
-            decoded_data = json.loads(data)
-            return UserData(**decoded_data)
-        return None
+        if self.cache is not None:
+            user_data = self.cache.get(id_)
+            if user_data is not None:
+                return user_data
+
+        async with self.redis.client() as client:
+            data = await client.hgetall(self._user_key(id_))
+        if not data:
+            return None
+
+        user_data = UserData.from_mapping(data)
+        if self.cache is not None:
+            self.cache.set(user_data)
+        return user_data
+
+    async def get_message_thread_id(self, id_: int) -> int | None:
+        """
+        Retrieves the message thread ID of the user directly from Redis, bypassing the cache.
+
+        :param id_: The ID of the user.
+        :return: The message thread ID or None if the user has no forum topic.
+        """
+        async with self.redis.client() as client:
+            value = await client.hget(self._user_key(id_), "message_thread_id")
+        return None if value is None else int(value)
+
+    def lock(self, name: str, timeout: float) -> Lock:
+        """
+        Returns a Redis lock shared by all bot instances using the same Redis database.
+
+        :param name: The name of the lock.
+        :param timeout: The number of seconds after which the lock expires, and also
+            the maximum number of seconds to wait for acquiring it.
+        :return: The lock, to be used as an async context manager.
+        """
+        return self.redis.lock(f"{self.LOCK_PREFIX}{name}", timeout=timeout, blocking_timeout=timeout)
+
+    async def get_or_create_user(self, data: UserData) -> tuple[UserData, bool]:
+        """
+        Retrieves user data or stores the given data if the user is not found.
+        Both cases take a single round trip to Redis.
+
+        :param data: The user data to be stored if the user is not found.
+        :return: A tuple of the stored user data and a flag indicating whether it was created.
+        """
+        if self.cache is not None:
+            user_data = self.cache.get(data.id)
+            if user_data is not None:
+                return user_data, False
+
+        stored = await self._get_or_create_script(**self._get_or_create_args(data))
+        return self._get_or_create_result(data, stored)
+
+    def _get_or_create_args(self, data: UserData) -> dict[str, list]:
+        """
+        Returns the keys and arguments of the get-or-create script.
+
+        :param data: The user data to be stored if the user is not found.
+        :return: Dictionary with the script keys and arguments.
+        """
+        mapping = data.to_mapping()
+        return {
+            "keys": [self._user_key(data.id), self.IDS_NAME, self.INDEX_NAME],
+            "args": [
+                data.id,
+                mapping["message_thread_id"] or "",
+                *(item for name, value in mapping.items() if value is not None for item in (name, value)),
+            ],
+        }
+
+    def _get_or_create_result(self, data: UserData, stored: list[bytes] | None) -> tuple[UserData, bool]:
+        """
+        Converts the reply of the get-or-create script and caches the user data.
+
+        :param data: The user data passed to the script.
+        :param stored: The reply of the script.
+        :return: A tuple of the stored user data and a flag indicating whether it was created.
+        """
+        if stored is None:
+            data.mark_clean()
+            user_data, created = data, True
+        else:
+            user_data, created = UserData.from_mapping(self._to_mapping(stored)), False
+
+        if self.cache is not None:
+            self.cache.set(user_data)
+        return user_data, created
+
+    async def get_or_create_user_and_get(self, data: UserData, key: str) -> tuple[UserData, bool, bytes | None]:
+        """
+        Same as get_or_create_user, and also reads a string key in the same round trip,
+        e.g. the FSM data of the user.
+
+        :param data: The user data to be stored if the user is not found.
+        :param key: The name of the string key to be read.
+        :return: A tuple of the stored user data, a flag indicating whether it was created, and the key value.
+        """
+        if self.cache is not None:
+            user_data = self.cache.get(data.id)
+            if user_data is not None:
+                async with self.redis.client() as client:
+                    return user_data, False, await client.get(key)
+
+        script_args = self._get_or_create_args(data)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.get(key)
+            # Call the script by its SHA directly, a pipeline would check for it with an extra round trip
+            pipe.evalsha(
+                self._get_or_create_script.sha,
+                len(script_args["keys"]),
+                *script_args["keys"],
+                *script_args["args"],
+            )
+            value, stored = await pipe.execute(raise_on_error=False)
+
+        if isinstance(stored, NoScriptError):
+            # The script cache of Redis has been flushed, the call loads the script again
+            stored = await self._get_or_create_script(**script_args)
+        elif isinstance(stored, Exception):
+            raise stored
+
+        return (*self._get_or_create_result(data, stored), value)
+
+    async def set_fields(self, id_: int, **fields: Any) -> bool:
+        """
+        Atomically sets fields of an existing user in a single round trip.
+        Other fields are left untouched, so concurrent writers of different fields don't overwrite each other.
+        If the forum topic is changed, the entry of the old topic is removed from the index.
+
+        :param id_: The ID of the user.
+        :param fields: The fields to be set, None removes the field.
+        :return: True if the user exists and has been updated.
+        """
+        pairs, removed = [], []
+        for name, value in fields.items():
+            if name not in UserData.__dataclass_fields__:
+                raise ValueError(f"Unknown user data field {name!r}.")
+            value = UserData.encode_value(value)
+            if value is None:
+                removed.append(name)
+            else:
+                pairs.extend((name, value))
+
+        updated = await self._set_fields_script(
+            keys=[self._user_key(id_), self.INDEX_NAME],
+            args=[id_, *self._invalidation_args(id_), len(pairs) // 2, *pairs, *removed],
+        )
+        if self.cache is not None:
+            self.cache.invalidate(id_)
+        return bool(updated)
+
+    async def toggle_field(self, id_: int, name: str) -> bool | None:
+        """
+        Atomically inverts a boolean field of an existing user in a single round trip.
+
+        :param id_: The ID of the user.
+        :param name: The name of the boolean field, e.g. "is_banned".
+        :return: The new value or None if the user is not found.
+        """
+        field = UserData.__dataclass_fields__.get(name)
+        if field is None or field.type is not bool:
+            raise ValueError(f"Field {name!r} is not a boolean user data field.")
+
+        value = await self._toggle_script(
+            keys=[self._user_key(id_)],
+            args=[name, *self._invalidation_args(id_)],
+        )
+        if self.cache is not None:
+            self.cache.invalidate(id_)
+        return None if value is None else value == b"1"
 
     async def update_user(self, id_: int, data: UserData) -> None:
         """
         Updates user data in Redis.
 
+        Only the fields changed since the data was loaded are written, in a single round trip.
+
         :param id_: The ID of the user to be updated.
         :param data: The updated user data.
         """
-        json_data = json.dumps(data.to_dict())
-        await self._set(self.NAME, id_, json_data)
-        await self._update_index(data.message_thread_id, id_)
+        if not data.is_dirty:
+            return
+
+        await self.set_fields(id_, **{name: getattr(data, name) for name in data.dirty_fields})
+        data.mark_clean()
+
+    async def count_users(self) -> int:
+        """
+        Counts all users stored in the Redis set.
+
+        :return: The number of users.
+        """
+        async with self.redis.client() as client:
+            return await client.scard(self.IDS_NAME)
 
-    async def get_all_users_ids(self) -> list[int]:
+    async def iter_users_ids(self, batch_size: int = 500) -> AsyncIterator[int]:
         """
-        Retrieves all user IDs stored in the Redis hash.
+        Iterates over all user IDs with SSCAN, fetching them from Redis in batches,
+        so neither Redis nor the bot has to hold the whole list at once.
+        Users added or removed during the iteration may or may not be returned.
 
-        :return: A list of all user IDs.
+        :param batch_size: The number of IDs requested from Redis per call.
+        :return: An async iterator of user IDs.
         """
         async with self.redis.client() as client:
-            user_ids = await client.hkeys(self.NAME)
-            return [int(user_id) for user_id in user_ids]
+            async for user_id in client.sscan_iter(self.IDS_NAME, count=batch_size):
+                yield int(user_id)
@@ -1,4 +1,10 @@
-from abc import abstractmethod, ABCMeta
+import json
+import logging
+from abc import ABCMeta
+from pathlib import Path
+from string import Formatter
+from types import MappingProxyType
+from typing import Callable, Mapping
 
 from aiogram.utils.markdown import hbold
 
@@ -9,12 +15,85 @@ SUPPORTED_LANGUAGES = {
     "en": "🇬🇧 English",
 }
 
+# Directory with the optional "<language_code>.json" files overriding or extending the built-in texts
+LOCALES_DIR = Path(__file__).parents[2] / "locales"
+
+
+class Catalog:
+    """
+    Catalog of texts in different languages, built once and shared by all Text instances.
+
+    A language is loaded on the first use from its built-in texts and the locale file, if any.
+    The templates are only validated when loaded, so a broken template fails at once instead of on sending,
+    they are still parsed by str.format on each use.
+    The loaded texts are read-only.
+    """
+
+    def __init__(
+            self,
+            builtin: dict[str, Callable[[], dict[str, str]]],
+            locales_dir: Path | None = None,
+    ) -> None:
+        """
+        Initializes the Catalog instance.
+
+        :param builtin: The functions returning the built-in texts, by language code.
+        :param locales_dir: The directory with the locale files.
+        """
+        self.builtin = builtin
+        self.locales_dir = locales_dir
+        self._locales: dict[str, Mapping[str, str]] = {}
+
+    def locale(self, language_code: str) -> Mapping[str, str]:
+        """
+        Returns the texts of the language, loading them on the first use.
+
+        :param language_code: The language code.
+        :return: Read-only mapping of text codes to texts.
+        """
+        texts = self._locales.get(language_code)
+        if texts is None:
+            texts = self._locales[language_code] = self._load(language_code)
+        return texts
+
+    def _load(self, language_code: str) -> Mapping[str, str]:
+        """
+        Builds the texts of the language.
+
+        :param language_code: The language code.
+        :return: Read-only mapping of text codes to texts.
+        :raises ValueError: If a text is not a string or a template is malformed.
+        """
+        builtin = self.builtin.get(language_code)
+        texts = {} if builtin is None else builtin()
+
+        path = None if self.locales_dir is None else self.locales_dir / f"{language_code}.json"
+        if path is not None and path.is_file():
+            texts.update(json.loads(path.read_text(encoding="utf-8")))
+            logging.info(f"Loaded locale file {path}")
+
+        for code, text in texts.items():
+            # The locale files may contain any JSON value
+            if not isinstance(text, str):
+                raise ValueError(
+                    f"Text {code!r} of language {language_code!r} is {type(text).__name__}, not a string"
+                )
+            try:
+                # Validate the whole template, the parser is lazy
+                list(Formatter().parse(text))
+            except ValueError as e:
+                raise ValueError(f"Malformed text {code!r} of language {language_code!r}: {e}") from e
+
+        return MappingProxyType(texts)
+
 
 class Text(metaclass=ABCMeta):
     """
     Abstract base class for handling text data in different languages.
     """
 
+    CATALOG: Catalog
+
     def __init__(self, language_code: str) -> None:
         """
         Initializes the Text instance with the specified language code.
@@ -24,14 +103,13 @@ class Text(metaclass=ABCMeta):
         self.language_code = language_code if language_code in SUPPORTED_LANGUAGES.keys() else "en"
 
     @property
-    @abstractmethod
-    def data(self) -> dict:
+    def data(self) -> Mapping[str, str]:
         """
-        Abstract property to be implemented by subclasses. Represents the language-specific text data.
+        Provides the texts of the current language.
 
-        :return: Dictionary containing language-specific text data.
+        :return: Read-only mapping of text codes to texts.
         """
-        raise NotImplementedError
+        return self.CATALOG.locale(self.language_code)
 
     def get(self, code: str) -> str:
         """
@@ -40,7 +118,133 @@ class Text(metaclass=ABCMeta):
         :param code: The code associated with the desired text.
         :return: The text in the current language.
         """
-        return self.data[self.language_code][code]
+        return self.CATALOG.locale(self.language_code)[code]
+
+
+def _en_messages() -> dict[str, str]:
+    """
+    Provides the built-in English text messages.
+
+    :return: Dictionary of text codes and texts.
+    """
+    return {
+        "select_language": f"👋 <b>Hello</b>, {hbold('{full_name}')}!\n\nSelect language:",
+        "change_language": "<b>Select language:</b>",
+        "main_menu": "<b>Write your question</b>, and we will answer you as soon as possible:",
+        "message_sent": "<b>Message sent!</b> Expect a response.",
+        "message_edited": (
+            "<b>The message was edited only in your chat.</b> "
+            "To send an edited message, send it as a new message."
+        ),
+        "source": (
+            "Source code available at "
+            "<a href=\"https://github.com/nessshon/support-bot\">GitHub</a>"
+        ),
+        "user_started_bot": (
+            f"User {hbold('{name}')} started the bot!\n\n"
+            "List of available commands:\n\n"
+            "• /ban\n"
+            "Block/Unblock user"
+            "<blockquote>Block the user if you do not want to receive messages from him.</blockquote>\n\n"
+            "• /silent\n"
+            "Activate/Deactivate silent mode"
+            "<blockquote>When silent mode is enabled, messages are not sent to the user.</blockquote>\n\n"
+            "• /information\n"
+            "User information"
+            "<blockquote>Receive a message with basic information about the user.</blockquote>"
+        ),
+        "user_restarted_bot": f"User {hbold('{name}')} restarted the bot!",
+        "user_stopped_bot": f"User {hbold('{name}')} stopped the bot!",
+        "user_blocked": "<b>User blocked!</b> Messages from the user are not accepted.",
+        "user_unblocked": "<b>User unblocked!</b> Messages from the user are being accepted again.",
+        "blocked_by_user": "<b>Message not sent!</b> The bot has been blocked by the user.",
+        "user_information": (
+            "<b>ID:</b>\n"
+            "- <code>{id}</code>\n"
+            "<b>Name:</b>\n"
+            "- {full_name}\n"
+            "<b>Status:</b>\n"
+            "- {state}\n"
+            "<b>Username:</b>\n"
+            "- {username}\n"
+            "<b>Blocked:</b>\n"
+            "- {is_banned}\n"
+            "<b>Registration date:</b>\n"
+            "- {created_at}"
+        ),
+        "message_not_sent": "<b>Message not sent!</b> An unexpected error occurred.",
+        "message_sent_to_user": "<b>Message sent to user!</b>",
+        "silent_mode_enabled": (
+            "<b>Silent mode activated!</b> Messages will not be delivered to the user."
+        ),
+        "silent_mode_disabled": (
+            "<b>Silent mode deactivated!</b> The user will receive all messages."
+        ),
+
+    }
+
+
+def _ru_messages() -> dict[str, str]:
+    """
+    Provides the built-in Russian text messages.
+
+    :return: Dictionary of text codes and texts.
+    """
+    return {
+        "select_language": f"👋 <b>Привет</b>, {hbold('{full_name}')}!\n\nВыберите язык:",
+        "change_language": "<b>Выберите язык:</b>",
+        "main_menu": "<b>Оставьте свой вопрос</b>, и мы ответим вам в ближайшее время:",
+        "message_sent": "<b>Сообщение отправлено!</b> Ожидайте ответа.",
+        "message_edited": (
+            "<b>Сообщение отредактировано только в вашем чате.</b> "
+            "Чтобы отправить отредактированное сообщение, отправьте его как новое сообщение."
+        ),
+        "source": (
+            "Исходный код доступен на "
+            "<a href=\"https://github.com/nessshon/support-bot\">GitHub</a>"
+        ),
+        "user_started_bot": (
+            f"Пользователь {hbold('{name}')} запустил(а) бота!\n\n"
+            "Список доступных команд:\n\n"
+            "• /ban\n"
+            "Заблокировать/Разблокировать пользователя"
+            "<blockquote>Заблокируйте пользователя, если не хотите получать от него сообщения.</blockquote>\n\n"
+            "• /silent\n"
+            "Активировать/Деактивировать тихий режим"
+            "<blockquote>При включенном тихом режиме сообщения не отправляются пользователю.</blockquote>\n\n"
+            "• /information\n"
+            "Информация о пользователе"
+            "<blockquote>Получить сообщение с основной информацией о пользователе.</blockquote>"
+        ),
+        "user_restarted_bot": f"Пользователь {hbold('{name}')} перезапустил(а) бота!",
+        "user_stopped_bot": f"Пользователь {hbold('{name}')} остановил(а) бота!",
+        "user_blocked": "<b>Пользователь заблокирован!</b> Сообщения от пользователя не принимаются.",
+        "user_unblocked": "<b>Пользователь разблокирован!</b> Сообщения от пользователя вновь принимаются.",
+        "blocked_by_user": "<b>Сообщение не отправлено!</b> Бот был заблокирован пользователем.",
+        "user_information": (
+            "<b>ID:</b>\n"
+            "- <code>{id}</code>\n"
+            "<b>Имя:</b>\n"
+            "- {full_name}\n"
+            "<b>Статус:</b>\n"
+            "- {state}\n"
+            "<b>Username:</b>\n"
+            "- {username}\n"
+            "<b>Заблокирован:</b>\n"
+            "- {is_banned}\n"
+            "<b>Дата регистрации:</b>\n"
+            "- {created_at}"
+        ),
+        "message_not_sent": "<b>Сообщение не отправлено!</b> Произошла неожиданная ошибка.",
+        "message_sent_to_user": "<b>Сообщение отправлено пользователю!</b>",
+        "silent_mode_enabled": (
+            "<b>Тихий режим активирован!</b> Сообщения не будут доставлены пользователю."
+        ),
+        "silent_mode_disabled": (
+            "<b>Тихий режим деактивирован!</b> Пользователь будет получать все сообщения."
+        ),
+
+    }
 
 
 class TextMessage(Text):
@@ -48,120 +252,10 @@ class TextMessage(Text):
     Subclass of Text for managing text messages in different languages.
     """
 
-    @property
-    def data(self) -> dict:
-        """
-        Provides language-specific text data for text messages.
-
-        :return: Dictionary containing language-specific text data for text messages.
-        """
-        return {
-            "en": {
-                "select_language": f"👋 <b>Hello</b>, {hbold('{full_name}')}!\n\nSelect language:",
-                "change_language": "<b>Select language:</b>",
-                "main_menu": "<b>Write your question</b>, and we will answer you as soon as possible:",
-                "message_sent": "<b>Message sent!</b> Expect a response.",
-                "message_edited": (
-                    "<b>The message was edited only in your chat.</b> "
-                    "To send an edited message, send it as a new message."
-                ),
-                "source": (
-                    "Source code available at "
-                    "<a href=\"https://github.com/nessshon/support-bot\">GitHub</a>"
-                ),
-                "user_started_bot": (
-                    f"User {hbold('{name}')} started the bot!\n\n"
-                    "List of available commands:\n\n"
-                    "• /ban\n"
-                    "Block/Unblock user"
-                    "<blockquote>Block the user if you do not want to receive messages from him.</blockquote>\n\n"
-                    "• /silent\n"
-                    "Activate/Deactivate silent mode"
-                    "<blockquote>When silent mode is enabled, messages are not sent to the user.</blockquote>\n\n"
-                    "• /information\n"
-                    "User information"
-                    "<blockquote>Receive a message with basic information about the user.</blockquote>"
-                ),
-                "user_restarted_bot": f"User {hbold('{name}')} restarted the bot!",
-                "user_stopped_bot": f"User {hbold('{name}')} stopped the bot!",
-                "user_blocked": "<b>User blocked!</b> Messages from the user are not accepted.",
-                "user_unblocked": "<b>User unblocked!</b> Messages from the user are being accepted again.",
-                "blocked_by_user": "<b>Message not sent!</b> The bot has been blocked by the user.",
-                "user_information": (
-                    "<b>ID:</b>\n"
-                    "- <code>{id}</code>\n"
-                    "<b>Name:</b>\n"
-                    "- {full_name}\n"
-                    "<b>Status:</b>\n"
-                    "- {state}\n"
-                    "<b>Username:</b>\n"
-                    "- {username}\n"
-                    "<b>Blocked:</b>\n"
-                    "- {is_banned}\n"
-                    "<b>Registration date:</b>\n"
-                    "- {created_at}"
-                ),
-                "message_not_sent": "<b>Message not sent!</b> An unexpected error occurred.",
-                "message_sent_to_user": "<b>Message sent to user!</b>",
-                "silent_mode_enabled": (
-                    "<b>Silent mode activated!</b> Messages will not be delivered to the user."
-                ),
-                "silent_mode_disabled": (
-                    "<b>Silent mode deactivated!</b> The user will receive all messages."
-                ),
-            },
-            "ru": {
-                "select_language": f"👋 <b>Привет</b>, {hbold('{full_name}')}!\n\nВыберите язык:",
-                "change_language": "<b>Выберите язык:</b>",
-                "main_menu": "<b>Оставьте свой вопрос</b>, и мы ответим вам в ближайшее время:",
-                "message_sent": "<b>Сообщение отправлено!</b> Ожидайте ответа.",
-                "message_edited": (
-                    "<b>Сообщение отредактировано только в вашем чате.</b> "
-                    "Чтобы отправить отредактированное сообщение, отправьте его как новое сообщение."
-                ),
-                "source": (
-                    "Исходный код доступен на "
-                    "<a href=\"https://github.com/nessshon/support-bot\">GitHub</a>"
-                ),
-                "user_started_bot": (
-                    f"Пользователь {hbold('{name}')} запустил(а) бота!\n\n"
-                    "Список доступных команд:\n\n"
-                    "• /ban\n"
-                    "Заблокировать/Разблокировать пользователя"
-                    "<blockquote>Заблокируйте пользователя, если не хотите получать от него сообщения.</blockquote>\n\n"
-                    "• /silent\n"
-                    "Активировать/Деактивировать тихий режим"
-                    "<blockquote>При включенном тихом режиме сообщения не отправляются пользователю.</blockquote>\n\n"
-                    "• /information\n"
-                    "Информация о пользователе"
-                    "<blockquote>Получить сообщение с основной информацией о пользователе.</blockquote>"
-                ),
-                "user_restarted_bot": f"Пользователь {hbold('{name}')} перезапустил(а) бота!",
-                "user_stopped_bot": f"Пользователь {hbold('{name}')} остановил(а) бота!",
-                "user_blocked": "<b>Пользователь заблокирован!</b> Сообщения от пользователя не принимаются.",
-                "user_unblocked": "<b>Пользователь разблокирован!</b> Сообщения от пользователя вновь принимаются.",
-                "blocked_by_user": "<b>Сообщение не отправлено!</b> Бот был заблокирован пользователем.",
-                "user_information": (
-                    "<b>ID:</b>\n"
-                    "- <code>{id}</code>\n"
-                    "<b>Имя:</b>\n"
-                    "- {full_name}\n"
-                    "<b>Статус:</b>\n"
-                    "- {state}\n"
-                    "<b>Username:</b>\n"
-                    "- {username}\n"
-                    "<b>Заблокирован:</b>\n"
-                    "- {is_banned}\n"
-                    "<b>Дата регистрации:</b>\n"
-                    "- {created_at}"
-                ),
-                "message_not_sent": "<b>Сообщение не отправлено!</b> Произошла неожиданная ошибка.",
-                "message_sent_to_user": "<b>Сообщение отправлено пользователю!</b>",
-                "silent_mode_enabled": (
-                    "<b>Тихий режим активирован!</b> Сообщения не будут доставлены пользователю."
-                ),
-                "silent_mode_disabled": (
-                    "<b>Тихий режим деактивирован!</b> Пользователь будет получать все сообщения."
-                ),
-            },
-        }
+    CATALOG = Catalog(
+        builtin={
+            "en": _en_messages,
+            "ru": _ru_messages,
+        },
+        locales_dir=LOCALES_DIR,
+    )
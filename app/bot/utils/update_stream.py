@@ -0,0 +1,205 @@
+import asyncio
+import json
+import logging
+import zlib
+from typing import Any
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from redis.asyncio import Redis
+from redis.exceptions import ResponseError
+
+
+def get_conversation(update: dict[str, Any]) -> str | None:
+    """
+    Returns the conversation of a raw update: a forum topic in the group,
+    or a user in any other chat, like ConcurrencyMiddleware does.
+
+    :param update: The update as received from Telegram.
+    :return: The conversation key, or None if the update has no chat or user.
+    """
+    event_type = next((key for key in update if key != "update_id"), None)
+    event = update.get(event_type) if event_type else None
+    if not isinstance(event, dict):
+        return None
+
+    # The callback queries are bound to the chat of their message
+    message = (event.get("message") or {}) if event_type == "callback_query" else event
+    chat_id = message.get("chat", {}).get("id")
+    user_id = event.get("from", {}).get("id")
+
+    if chat_id is not None and message.get("is_topic_message"):
+        return f"{chat_id}:{message.get('message_thread_id')}"
+    if chat_id is None and user_id is None:
+        return None
+    return f"{chat_id}:{user_id}"
+
+
+class UpdateRouter:
+    """
+    Routes the received updates to the streams of the bot processes.
+
+    The updates of a conversation always go to the same stream, chosen by a hash of the conversation,
+    so each conversation is processed by one bot process, in order.
+    The streams are not capped, the processed updates are deleted by the consumers,
+    so the updates of a bot process that is down are kept until it processes them.
+    """
+
+    PREFIX = "updates"
+
+    def __init__(self, redis: Redis, shards: int) -> None:
+        """
+        Initializes the UpdateRouter instance.
+
+        :param redis: The Redis instance.
+        :param shards: The number of bot processes.
+        """
+        self.redis = redis
+        self.shards = shards
+
+    def get_shard(self, update: dict[str, Any]) -> int:
+        """
+        Returns the number of the bot process the update is routed to.
+
+        :param update: The update as received from Telegram.
+        :return: The number of the bot process.
+        """
+        conversation = get_conversation(update)
+        if conversation is None:
+            return update["update_id"] % self.shards
+        return zlib.crc32(conversation.encode()) % self.shards
+
+    async def route(self, updates: list[dict[str, Any]]) -> None:
+        """
+        Adds the updates to the streams with a single round trip.
+
+        :param updates: The updates as received from Telegram.
+        """
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for update in updates:
+                pipe.xadd(f"{self.PREFIX}:{self.get_shard(update)}", {"update": json.dumps(update)})
+            await pipe.execute()
+
+
+class UpdateConsumer:
+    """
+    Processes the updates of the stream of a bot process.
+
+    The stream is read with a consumer group, so the updates read but not processed
+    before a restart are processed again. The processed updates are acknowledged in batches.
+    The Redis instance should not be the one closed by the dispatcher on shutdown,
+    as the updates processed during the shutdown are acknowledged after it.
+    """
+
+    GROUP = "workers"
+
+    def __init__(
+            self,
+            redis: Redis,
+            dispatcher: Dispatcher,
+            bot: Bot,
+            shard: int,
+            batch_size: int = 100,
+            max_pending: int = 1000,
+    ) -> None:
+        """
+        Initializes the UpdateConsumer instance.
+
+        :param redis: The Redis instance.
+        :param dispatcher: The Dispatcher processing the updates.
+        :param bot: The Bot instance.
+        :param shard: The number of the bot process.
+        :param batch_size: The maximum number of updates read at once.
+        :param max_pending: The maximum number of updates read and not processed yet.
+        """
+        self.redis = redis
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.stream = f"{UpdateRouter.PREFIX}:{shard}"
+        self.consumer = f"worker-{shard}"
+        self.batch_size = batch_size
+
+        self._slots = asyncio.Semaphore(max_pending)
+        self._tasks: set[asyncio.Task] = set()
+        self._acks: list[bytes] = []
+
+    async def run(self, stop: asyncio.Event) -> None:
+        """
+        Processes the updates until stopped. The updates being processed are not waited for.
+
+        :param stop: The event stopping reading the stream.
+        """
+        try:
+            await self.redis.xgroup_create(self.stream, self.GROUP, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+        # Process the updates left unacknowledged by the previous run first, then the new ones
+        last_id, recovering = "0", True
+        while not stop.is_set():
+            try:
+                await self._ack()
+                response = await self.redis.xreadgroup(
+                    self.GROUP, self.consumer, {self.stream: last_id},
+                    count=self.batch_size, block=1000,
+                )
+            except Exception as e:
+                logging.exception(f"Failed to read {self.stream}: {e}")
+                await asyncio.sleep(1)
+                continue
+
+            entries = response[0][1] if response else []
+            if recovering:
+                if entries:
+                    last_id = entries[-1][0]
+                else:
+                    last_id, recovering = ">", False
+            for entry_id, fields in entries:
+                try:
+                    update = Update.model_validate_json(fields[b"update"], context={"bot": self.bot})
+                except Exception as e:
+                    # The entry has been deleted or is malformed, skip it
+                    logging.error(f"Skipping {self.stream} entry {entry_id}: {e}")
+                    self._acks.append(entry_id)
+                    continue
+
+                await self._slots.acquire()
+                task = asyncio.create_task(self._process(entry_id, update))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+    async def close(self) -> None:
+        """
+        Acknowledges the processed updates, the ones still being processed are processed
+        again after a restart.
+        """
+        await self._ack()
+        if self._tasks:
+            logging.warning(f"{len(self._tasks)} updates of {self.stream} are left for the next run")
+
+    async def _process(self, entry_id: bytes, update: Update) -> None:
+        """
+        Processes an update and marks it for acknowledgement.
+
+        :param entry_id: The ID of the stream entry.
+        :param update: The update.
+        """
+        try:
+            await self.dispatcher.feed_update(self.bot, update)
+        except Exception as e:
+            logging.exception(f"Failed to process update {update.update_id}: {e}")
+        finally:
+            self._acks.append(entry_id)
+            self._slots.release()
+
+    async def _ack(self) -> None:
+        """
+        Acknowledges the processed updates and deletes them from the stream.
+        """
+        if self._acks:
+            acks, self._acks = self._acks, []
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.xack(self.stream, self.GROUP, *acks)
+                pipe.xdel(self.stream, *acks)
+                await pipe.execute()
@@ -1,6 +1,7 @@
 from dataclasses import dataclass
 
 from environs import Env
+from marshmallow.validate import OneOf
 
 
 @dataclass
@@ -43,6 +44,196 @@ class RedisConfig:
         return f"redis://{self.HOST}:{self.PORT}/{self.DB}"
 
 
+@dataclass
+class CommandsConfig:
+    """
+    Data class representing the configuration for the bot commands.
+
+    Attributes:
+    - DELETE_ON_SHUTDOWN (bool): Whether the commands are deleted when the bot shuts down.
+    """
+    DELETE_ON_SHUTDOWN: bool
+
+
+@dataclass
+class WebhookConfig:
+    """
+    Data class representing the configuration for receiving updates with a webhook.
+
+    Attributes:
+    - URL (str): The public base URL of the webhook server, empty to use long polling.
+    - PATH (str): The path of the webhook endpoint.
+    - SECRET (str): The secret token checked in the requests from Telegram, empty to skip the check.
+    - HOST (str): The host the webhook server listens on.
+    - PORT (int): The port the webhook server listens on.
+    - WORKERS (int): The number of bot processes sharing the port, without keeping the order of the updates.
+    """
+    URL: str
+    PATH: str
+    SECRET: str
+    HOST: str
+    PORT: int
+    WORKERS: int
+
+    def url(self) -> str:
+        """
+        Generates the webhook URL from the base URL and the path.
+
+        :return: The webhook URL.
+        """
+        return f"{self.URL.rstrip('/')}{self.PATH}"
+
+
+@dataclass
+class ShardingConfig:
+    """
+    Data class representing the configuration for processing updates in several processes.
+
+    Attributes:
+    - WORKERS (int): The number of bot processes the updates are routed to by conversation,
+      1 processes the updates in the receiving process.
+    """
+    WORKERS: int
+
+
+@dataclass
+class ConcurrencyConfig:
+    """
+    Data class representing the configuration for processing updates concurrently.
+
+    Attributes:
+    - LIMIT (int): The maximum number of updates processed at once, 0 for no limit.
+    """
+    LIMIT: int
+
+
+@dataclass
+class CacheConfig:
+    """
+    Data class representing the configuration for the in-process user data cache.
+
+    Attributes:
+    - ENABLED (bool): Whether the cache is enabled.
+    - MAXSIZE (int): The maximum number of cached users.
+    - TTL (float): The time-to-live in seconds for the cache entries.
+    """
+    ENABLED: bool
+    MAXSIZE: int
+    TTL: float
+
+
+@dataclass
+class TopicPoolConfig:
+    """
+    Data class representing the configuration for the pool of ready forum topics.
+
+    Attributes:
+    - SIZE (int): The number of forum topics kept ready, 0 disables the pool.
+    """
+    SIZE: int
+
+
+@dataclass
+class RateLimitConfig:
+    """
+    Data class representing the configuration for the outgoing requests rate limiter.
+
+    Attributes:
+    - ENABLED (bool): Whether the rate limiter is enabled.
+    - GLOBAL (float): The number of requests per second to all chats.
+    - CHAT (float): The number of messages per second to a private chat.
+    - GROUP (float): The number of messages per minute to a group.
+    """
+    ENABLED: bool
+    GLOBAL: float
+    CHAT: float
+    GROUP: float
+
+
+@dataclass
+class RetryConfig:
+    """
+    Data class representing the configuration for retrying failed requests.
+
+    Attributes:
+    - ATTEMPTS (int): The maximum number of retries of a request, 0 disables retrying.
+    - MAX_DELAY (float): The maximum number of seconds to wait before a retry.
+    """
+    ATTEMPTS: int
+    MAX_DELAY: float
+
+
+@dataclass
+class ThrottlingConfig:
+    """
+    Data class representing the configuration for throttling incoming messages.
+
+    Attributes:
+    - COALESCE (float): The number of seconds throttled user messages are collected
+      before forwarding them to the topic at once, 0 ignores throttled messages.
+    """
+    COALESCE: float
+
+
+@dataclass
+class AlbumConfig:
+    """
+    Data class representing the configuration for collecting albums.
+
+    Attributes:
+    - SHARED (bool): Whether the album parts are collected in Redis and shared by all bot processes.
+    """
+    SHARED: bool
+
+
+@dataclass
+class DeletionConfig:
+    """
+    Data class representing the configuration for the delayed message deletion.
+
+    Attributes:
+    - PERSISTENT (bool): Whether the pending deletions are kept in Redis and survive restarts.
+    """
+    PERSISTENT: bool
+
+
+@dataclass
+class ErrorsConfig:
+    """
+    Data class representing the configuration for reporting errors to the developer.
+
+    Attributes:
+    - REPORT_INTERVAL (float): The minimum number of seconds between the reports of the same error.
+    - DIGEST_INTERVAL (float): The number of seconds between the digests of the repeated errors.
+    """
+    REPORT_INTERVAL: float
+    DIGEST_INTERVAL: float
+
+
+@dataclass
+class ShutdownConfig:
+    """
+    Data class representing the configuration for shutting down the bot.
+
+    Attributes:
+    - TIMEOUT (float): The maximum number of seconds to wait for the updates and the newsletters being processed.
+    """
+    TIMEOUT: float
+
+
+@dataclass
+class LoggingConfig:
+    """
+    Data class representing the logging configuration.
+
+    Attributes:
+    - FORMAT (str): The format of the records, "text" or "json".
+    - SAMPLING (dict[str, float]): The share of the records below WARNING kept, by logger name.
+    """
+    FORMAT: str
+    SAMPLING: dict[str, float]
+
+
 @dataclass
 class Config:
     """
@@ -51,9 +242,37 @@ class Config:
     Attributes:
     - bot (BotConfig): The bot configuration.
     - redis (RedisConfig): The Redis configuration.
+    - commands (CommandsConfig): The bot commands configuration.
+    - webhook (WebhookConfig): The webhook configuration.
+    - sharding (ShardingConfig): The update routing configuration.
+    - concurrency (ConcurrencyConfig): The update processing concurrency configuration.
+    - cache (CacheConfig): The user data cache configuration.
+    - topic_pool (TopicPoolConfig): The forum topic pool configuration.
+    - rate_limit (RateLimitConfig): The rate limiter configuration.
+    - retry (RetryConfig): The request retry configuration.
+    - throttling (ThrottlingConfig): The incoming messages throttling configuration.
+    - album (AlbumConfig): The album collection configuration.
+    - deletion (DeletionConfig): The delayed message deletion configuration.
+    - errors (ErrorsConfig): The error reporting configuration.
+    - shutdown (ShutdownConfig): The shutdown configuration.
+    - logging (LoggingConfig): The logging configuration.
     """
     bot: BotConfig
     redis: RedisConfig
+    commands: CommandsConfig
+    webhook: WebhookConfig
+    sharding: ShardingConfig
+    concurrency: ConcurrencyConfig
+    cache: CacheConfig
+    topic_pool: TopicPoolConfig
+    rate_limit: RateLimitConfig
+    retry: RetryConfig
+    throttling: ThrottlingConfig
+    album: AlbumConfig
+    deletion: DeletionConfig
+    errors: ErrorsConfig
+    shutdown: ShutdownConfig
+    logging: LoggingConfig
 
 
 def load_config() -> Config:
@@ -77,4 +296,59 @@ def load_config() -> Config:
             PORT=env.int("REDIS_PORT"),
             DB=env.int("REDIS_DB"),
         ),
+        commands=CommandsConfig(
+            DELETE_ON_SHUTDOWN=env.bool("COMMANDS_DELETE_ON_SHUTDOWN", False),
+        ),
+        webhook=WebhookConfig(
+            URL=env.str("WEBHOOK_URL", ""),
+            PATH=env.str("WEBHOOK_PATH", "/webhook"),
+            SECRET=env.str("WEBHOOK_SECRET", ""),
+            HOST=env.str("WEBHOOK_HOST", "0.0.0.0"),
+            PORT=env.int("WEBHOOK_PORT", 8080),
+            WORKERS=env.int("WEBHOOK_WORKERS", 1),
+        ),
+        sharding=ShardingConfig(
+            WORKERS=env.int("SHARDING_WORKERS", 1),
+        ),
+        concurrency=ConcurrencyConfig(
+            LIMIT=env.int("CONCURRENCY_LIMIT", 100),
+        ),
+        cache=CacheConfig(
+            ENABLED=env.bool("CACHE_ENABLED", False),
+            MAXSIZE=env.int("CACHE_MAXSIZE", 10_000),
+            TTL=env.float("CACHE_TTL", 300),
+        ),
+        topic_pool=TopicPoolConfig(
+            SIZE=env.int("TOPIC_POOL_SIZE", 0),
+        ),
+        rate_limit=RateLimitConfig(
+            ENABLED=env.bool("RATE_LIMIT_ENABLED", False),
+            GLOBAL=env.float("RATE_LIMIT_GLOBAL", 30),
+            CHAT=env.float("RATE_LIMIT_CHAT", 1),
+            GROUP=env.float("RATE_LIMIT_GROUP", 20),
+        ),
+        retry=RetryConfig(
+            ATTEMPTS=env.int("RETRY_ATTEMPTS", 3),
+            MAX_DELAY=env.float("RETRY_MAX_DELAY", 30),
+        ),
+        throttling=ThrottlingConfig(
+            COALESCE=env.float("THROTTLING_COALESCE", 0),
+        ),
+        album=AlbumConfig(
+            SHARED=env.bool("ALBUM_SHARED", False),
+        ),
+        deletion=DeletionConfig(
+            PERSISTENT=env.bool("DELETION_PERSISTENT", False),
+        ),
+        errors=ErrorsConfig(
+            REPORT_INTERVAL=env.float("ERRORS_REPORT_INTERVAL", 600),
+            DIGEST_INTERVAL=env.float("ERRORS_DIGEST_INTERVAL", 3600),
+        ),
+        shutdown=ShutdownConfig(
+            TIMEOUT=env.float("SHUTDOWN_TIMEOUT", 8),
+        ),
+        logging=LoggingConfig(
+            FORMAT=env.str("LOGGING_FORMAT", "text", validate=OneOf(["text", "json"])),
+            SAMPLING=env.dict("LOGGING_SAMPLING", {}, subcast_values=float),
+        ),
     )
@@ -1,44 +1,186 @@
+import atexit
+import copy
+import json
 import logging
 import os
-from datetime import datetime
-from logging.handlers import TimedRotatingFileHandler
+import random
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+from queue import SimpleQueue
+from typing import Any, Dict
 
+from .config import LoggingConfig
 
-def setup_logger() -> None:
+# The update being processed, set by LogContextMiddleware: update_id, user_id, thread_id and handler
+log_context: ContextVar[Dict[str, Any] | None] = ContextVar("log_context", default=None)
+
+# The listener writing the records of this process
+_listener: QueueListener | None = None
+
+
+class ContextFilter(logging.Filter):
+    """
+    Adds the fields of the update being processed to the records,
+    and samples the records below WARNING of the high-volume loggers.
+    """
+
+    def __init__(self, sampling: Dict[str, float] | None = None) -> None:
+        """
+        Initializes the ContextFilter instance.
+
+        :param sampling: Mapping of logger names to the share of their records kept.
+        """
+        super().__init__()
+        self.sampling = sampling or {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """
+        Drops the sampled out records and adds the context to the others.
+
+        :param record: The log record.
+        :return: True if the record is kept.
+        """
+        rate = self.sampling.get(record.name)
+        if rate is not None and record.levelno < logging.WARNING and random.random() >= rate:
+            return False
+
+        context = log_context.get()
+        if context:
+            record.__dict__.update(context)
+        return True
+
+
+class ContextQueueHandler(QueueHandler):
+    """
+    Puts the records into the queue of the listener thread.
+
+    The message and the traceback are formatted before, in the logging thread,
+    the formatters of the listener handlers add the time, the level and the context.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Formats the message and the traceback of a copy of the record.
+
+        :param record: The log record.
+        :return: The record put into the queue.
+        """
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    Formats the records as compact JSON lines with the fields of the update being processed.
+    """
+
+    FIELDS = ("update_id", "user_id", "thread_id", "handler")
+
+    def format(self, record: logging.LogRecord) -> str:
+        """
+        Formats the record as a JSON line.
+
+        :param record: The log record.
+        :return: The JSON line.
+        """
+        data = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in self.FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                data[field] = value
+        if record.exc_text:
+            data["exc"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def setup_logger(config: LoggingConfig | None = None, name: str | None = None) -> None:
     """
     Set up the logger configuration for the application.
 
     This function ensures that the logs directory exists, configures basic logging,
     and sets the log level for specific loggers.
 
-    Logs are written to both a timed rotating file handler and a stream handler.
+    The records are put into a queue and written by a listener thread,
+    so logging doesn't block the event loop with file and console I/O.
 
     - Logs are saved to files in the ".logs" directory with a one-day rotation.
     - The console (stream) handler displays logs on the console.
+    - The records are formatted as text, or as JSON lines if configured.
 
-    The log level for the "aiogram.event" and "httpx" loggers is set to CRITICAL.
+    The log level for the "aiogram.event" logger is set to CRITICAL, unless it is sampled.
+    The function is called again by each bot process, as the listener thread is not inherited.
 
+    :param config: The logging configuration, or None for the text format without sampling.
+    :param name: The name of the bot process, added to the name of the log file.
     :return: None
     """
+    global _listener
+
+    format_ = config.FORMAT if config else "text"
+    sampling = config.SAMPLING if config else {}
+
     # Ensure the logs directory exists
     os.makedirs(".logs", exist_ok=True)
 
+    if format_ == "json":
+        formatter = JSONFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')  # noqa
+
+    suffix = f"_{name}" if name else ""
+    handlers = [
+        # Add a timed rotating file handler to log to a file
+        TimedRotatingFileHandler(
+            filename=f".logs/{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}{suffix}.log",
+            when="midnight",
+            interval=1,
+            backupCount=7,  # Keep logs for 7 days
+        ),
+        # Add a stream handler to log to the console
+        logging.StreamHandler(),
+    ]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    # Write the records in the listener thread
+    queue: SimpleQueue = SimpleQueue()
+    queue_handler = ContextQueueHandler(queue)
+    queue_handler.addFilter(ContextFilter(sampling))
+
+    stop_logger()
+    _listener = QueueListener(queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
     # Set up basic logging configuration
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',  # noqa
-        handlers=[
-            # Add a timed rotating file handler to log to a file
-            TimedRotatingFileHandler(
-                filename=f".logs/{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.log",
-                when="midnight",
-                interval=1,
-                backupCount=7,  # Keep logs for 7 days
-            ),
-            # Add a stream handler to log to the console
-            logging.StreamHandler(),
-        ]
-    )
-    # Set the log level for aiogram.event and httpx logger to CRITICAL
+    logging.basicConfig(level=logging.INFO, handlers=[queue_handler], force=True)
+
+    # Set the log level for aiogram.event logger to CRITICAL, unless it is sampled
     aiogram_logger = logging.getLogger("aiogram.event")
-    aiogram_logger.setLevel(logging.CRITICAL)
+    aiogram_logger.setLevel(logging.INFO if "aiogram.event" in sampling else logging.CRITICAL)
+
+
+@atexit.register
+def stop_logger() -> None:
+    """
+    Stops the listener thread after it has written the records in the queue.
+    The forked bot processes exit without the exit handlers, so they call it themselves.
+
+    :return: None
+    """
+    global _listener
+
+    # The listener thread of the parent process is not running in a forked process
+    if _listener is not None and _listener._thread is not None and _listener._thread.is_alive():  # noqa
+        _listener.stop()
+    _listener = None
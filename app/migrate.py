@@ -0,0 +1,43 @@
+import argparse
+import asyncio
+import logging
+
+from redis.asyncio import Redis
+
+from .bot.utils.redis.migrations import migrate_layout, migrate_thread_index
+from .config import load_config
+from .logger import setup_logger
+
+MIGRATIONS = {
+    "thread-index": migrate_thread_index,
+    "layout": migrate_layout,
+}
+
+
+async def main(name: str, batch_size: int) -> None:
+    """
+    Runs a Redis data migration.
+
+    :param name: The name of the migration.
+    :param batch_size: The number of records processed per batch.
+    """
+    config = load_config()
+    redis = Redis.from_url(config.redis.dsn())
+
+    try:
+        count = await MIGRATIONS[name](redis, batch_size=batch_size)
+        logging.info(f"Migration {name} finished, {count} records converted")
+    finally:
+        await redis.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run Redis data migrations.")
+    parser.add_argument("name", choices=MIGRATIONS.keys(), help="The name of the migration.")
+    parser.add_argument("--batch-size", type=int, default=500, help="The number of records processed per batch.")
+    args = parser.parse_args()
+
+    # Set up logging
+    setup_logger()
+    # Run the migration
+    asyncio.run(main(args.name, args.batch_size))
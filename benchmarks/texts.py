@@ -0,0 +1,31 @@
+"""
+Measures the per-update cost of the localized texts: a Manager creates a new TextMessage
+for every update and handlers read one or two texts from it.
+
+Run from the repository root:
+
+    python -m benchmarks.texts
+"""
+import timeit
+
+from app.bot.utils.texts import TextMessage
+
+NUMBER = 100_000
+
+
+def update() -> str:
+    """
+    Does the text work of a typical update.
+
+    :return: The formatted text.
+    """
+    text_message = TextMessage("ru")
+    text_message.get("message_sent")
+    return text_message.get("user_restarted_bot").format(name="name")
+
+
+if __name__ == "__main__":
+    # Load the catalog before measuring
+    update()
+    seconds = min(timeit.repeat(update, number=NUMBER, repeat=5))
+    print(f"{seconds / NUMBER * 1e6:.2f} µs per update")